@@ -52,12 +52,14 @@ class Settings:
     bot_token: str
     database_url: str
     admins: set[int]
+    rate_limit_backend: str
 
 
 settings = Settings(
     bot_token=os.getenv("BOT_TOKEN", ""),
     database_url=_build_database_url(),
     admins=_parse_admins(os.getenv("ADMINS")),
+    rate_limit_backend=os.getenv("RATE_LIMIT_BACKEND", "memory").strip().lower(),
 )
 
 if not settings.bot_token:
@@ -65,3 +67,6 @@ if not settings.bot_token:
 
 if not settings.database_url:
     raise RuntimeError("DATABASE_URL is not set")
+
+if settings.rate_limit_backend not in {"memory", "postgres"}:
+    raise RuntimeError("RATE_LIMIT_BACKEND must be 'memory' or 'postgres'")
@@ -0,0 +1,51 @@
+import asyncio
+import logging
+
+import asyncpg
+
+from app.config.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class NotifyListener:
+    # Dedicated asyncpg connection (outside the SQLAlchemy pool) that LISTENs on one channel.
+    # If the connection can't be (re)established, wait() degrades to a plain timeout so the
+    # caller's fallback poll still runs.
+    def __init__(self, channel: str, reconnect_delay: float = 5.0) -> None:
+        self.channel = channel
+        self._reconnect_delay = reconnect_delay
+        self._conn: asyncpg.Connection | None = None
+        self._event = asyncio.Event()
+
+    async def wait(self, timeout: float) -> None:
+        if not await self._ensure_connected():
+            await asyncio.sleep(min(timeout, self._reconnect_delay))
+            return
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._event.clear()
+
+    async def close(self) -> None:
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+        self._conn = None
+
+    async def _ensure_connected(self) -> bool:
+        if self._conn is not None and not self._conn.is_closed():
+            return True
+        try:
+            self._conn = await asyncpg.connect(settings.database_url.replace("postgresql+asyncpg", "postgresql"))
+            await self._conn.add_listener(self.channel, self._on_notify)
+        except Exception as exc:
+            logger.warning("LISTEN %s unavailable, falling back to polling: %s", self.channel, exc)
+            self._conn = None
+            return False
+        # Anything committed while we were disconnected has to be picked up by the caller.
+        self._event.set()
+        return True
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        self._event.set()
@@ -7,7 +7,9 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 
 from app.handlers.common import AdminFilter
-from app.services.giveaways import create_giveaway, global_stats
+from app.services.giveaways import create_giveaway, global_stats, subscription_cache_stats
+from app.services.finalizer import finalizer_pool
+from app.services.sender import current_send_rate
 from app.scheduler import schedule_giveaway_end
 from app.keyboards import winners_mode_kb, publish_post_kb, admin_root_kb
 
@@ -149,7 +151,8 @@ async def new_giveaway_ends_at(message: Message, state: FSMContext) -> None:
     await message.answer(
         "Розыгрыш создан!\n"
         f"ID: {giveaway.id}\n"
-        f"Ссылка: {deep_link}\n\n"
+        f"Ссылка: {deep_link}\n"
+        f"Хэш жеребьёвки: {giveaway.draw_commitment}\n\n"
         "Опубликовать пост в канале?",
         reply_markup=publish_post_kb(),
     )
@@ -271,6 +274,7 @@ async def edit_giveaway_field(message: Message, state: FSMContext) -> None:
     elif field == "ends_at":
         if text == "-":
             await update_giveaway_fields(giveaway_id, ends_at=None)
+            schedule_giveaway_end(giveaway_id, None)
             await message.answer("Дата окончания удалена.")
         else:
             try:
@@ -304,6 +308,8 @@ async def edit_giveaway_field(message: Message, state: FSMContext) -> None:
 @router.message(Command("admin"))
 async def list_giveaways(message: Message) -> None:
     stats = await global_stats()
+    subs = subscription_cache_stats()
+    age = int((datetime.now(timezone.utc) - stats["refreshed_at"]).total_seconds())
     text = (
         "Админ панель.\n\n"
         f"Всего розыгрышей: {stats['giveaways_total']}\n"
@@ -312,6 +318,14 @@ async def list_giveaways(message: Message) -> None:
         f"Уникальных участников: {stats['participants_total']}\n"
         f"Доступно для рассылки: {stats['participants_can_dm']}\n"
         f"Победителей всего: {stats['winners_total']}\n"
-        f"Рассылок всего: {stats['broadcasts_total']}"
+        f"Рассылок всего: {stats['broadcasts_total']}\n"
+        f"Текущий лимит отправки: {current_send_rate():.1f} msg/sec\n"
+        f"Кэш проверок подписки: {subs['hits']} попаданий / {subs['misses']} промахов\n"
+        f"Статистика обновлена {age} сек назад"
     )
+    for giveaway_id, (elapsed, ok, fail) in finalizer_pool.progress().items():
+        if elapsed is None:
+            text += f"\nИтоги #{giveaway_id}: в очереди"
+        else:
+            text += f"\nИтоги #{giveaway_id}: {elapsed:.0f} сек, уведомлено OK {ok} / FAIL {fail}"
     await message.answer(text, reply_markup=admin_root_kb())
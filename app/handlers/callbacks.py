@@ -1,6 +1,12 @@
+import asyncio
+import csv
+import logging
+import os
+import tempfile
 from aiogram import Router
+from aiogram.exceptions import TelegramAPIError
 from datetime import timedelta
-from aiogram.types import CallbackQuery
+from aiogram.types import CallbackQuery, FSInputFile
 
 from app.handlers.common import AdminFilter
 from app.keyboards import (
@@ -9,21 +15,28 @@ from app.keyboards import (
     admin_giveaway_kb,
     back_to_giveaway_kb,
     confirm_delete_kb,
+    participants_page_kb,
 )
 from app.services.giveaways import (
     get_giveaway,
     check_subscription,
     add_participant,
-    get_participant,
+    JOINED,
+    NOT_ACTIVE,
     participants_count,
-    winners_count,
-    broadcasts_count,
-    list_participants,
+    giveaway_counts,
+    list_participants_page,
+    iter_participants,
     finalize_and_notify,
     delete_giveaway,
+    WinnersPending,
 )
 from aiogram.fsm.context import FSMContext
 from app.handlers.admin import EditGiveaway
+from app.services.sender import send_message_limited
+from app.scheduler import cancel_giveaway_end, retry_giveaway_end
+
+logger = logging.getLogger(__name__)
 
 router = Router()
 
@@ -47,10 +60,10 @@ async def join_giveaway(callback: CallbackQuery) -> None:
         await callback.answer("Подпишитесь на канал и нажмите Проверить подписку", show_alert=True)
         return
 
-    added = await add_participant(giveaway.id, callback.from_user.id, callback.from_user.username)
-    if added:
-        participant = await get_participant(giveaway.id, callback.from_user.id)
-        ticket = participant.ticket_number if participant else "—"
+    outcome, ticket = await add_participant(giveaway.id, callback.from_user.id, callback.from_user.username)
+    if outcome == NOT_ACTIVE:
+        await callback.answer("Розыгрыш уже завершён.", show_alert=True)
+    elif outcome == JOINED:
         winners_info = "10"
         if giveaway.ends_at:
             msk_time = giveaway.ends_at + timedelta(hours=3)
@@ -67,8 +80,13 @@ async def join_giveaway(callback: CallbackQuery) -> None:
             f"⏳ <b>Дата подведения итогов:</b> {ends_at}\n\n"
             "⚠️ <b>Важно:</b> не удаляйте и не блокируйте бота — иначе мы не сможем уведомить вас о результате."
         )
-        await callback.message.answer(text)
+        # Answer first: the confirmation DM waits in the shared limiter queue and may outlive
+        # Telegram's window for answering the callback.
         await callback.answer("Вы участвуете в розыгрыше!", show_alert=True)
+        try:
+            await send_message_limited(callback.bot, callback.from_user.id, text, user_id=callback.from_user.id)
+        except TelegramAPIError:
+            logger.warning("Failed to send join confirmation to user %s", callback.from_user.id, exc_info=True)
     else:
         await callback.answer("Вы уже участвуете.", show_alert=True)
 
@@ -131,48 +149,126 @@ async def admin_panel(callback: CallbackQuery) -> None:
     await callback.answer()
 
 
+async def _participants_page(giveaway_id: int, after_id: int | None = None, before_id: int | None = None):
+    rows, has_prev, has_next = await list_participants_page(giveaway_id, after_id=after_id, before_id=before_id)
+    if not rows:
+        return None, None
+    count = await participants_count(giveaway_id)
+    preview = "\n".join(f"- {user_id} @{username}" if username else f"- {user_id}" for _, user_id, username in rows)
+    kb = participants_page_kb(giveaway_id, rows[0][0], rows[-1][0], has_prev, has_next)
+    return f"Участники ({count}):\n{preview}", kb
+
+
 @router.callback_query(AdminFilter(), lambda c: c.data.startswith("participants:"))
 async def participants(callback: CallbackQuery) -> None:
     giveaway_id = int(callback.data.split(":")[1])
-    participants_list = await list_participants(giveaway_id)
-    count = len(participants_list)
-    if count == 0:
+    text, kb = await _participants_page(giveaway_id)
+    if text is None:
         await callback.message.answer("Участников пока нет.", reply_markup=back_to_giveaway_kb(giveaway_id))
         await callback.answer()
         return
-    preview = "\n".join(
-        [f"- {p.user_id} @{p.username}" if p.username else f"- {p.user_id}" for p in participants_list[:50]]
-    )
-    more = "\n..." if count > 50 else ""
-    await callback.message.answer(
-        f"Участники ({count}):\n{preview}{more}",
-        reply_markup=back_to_giveaway_kb(giveaway_id),
-    )
+    await callback.message.answer(text, reply_markup=kb)
     await callback.answer()
 
 
+@router.callback_query(AdminFilter(), lambda c: c.data.startswith("participants_page:"))
+async def participants_page(callback: CallbackQuery) -> None:
+    _, giveaway_id, direction, cursor = callback.data.split(":")
+    if direction == "next":
+        text, kb = await _participants_page(int(giveaway_id), after_id=int(cursor))
+    else:
+        text, kb = await _participants_page(int(giveaway_id), before_id=int(cursor))
+    if text is None:
+        await callback.answer("Больше участников нет")
+        return
+    await callback.message.edit_text(text, reply_markup=kb)
+    await callback.answer()
+
+
+@router.callback_query(AdminFilter(), lambda c: c.data.startswith("participants_csv:"))
+async def participants_csv(callback: CallbackQuery) -> None:
+    giveaway_id = int(callback.data.split(":")[1])
+    await callback.answer("Готовлю выгрузку...")
+    # Rows are streamed page by page into a temp file, so memory use doesn't grow with the list.
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(["user_id", "username", "ticket_number", "joined_at"])
+            page = []
+            async for user_id, username, ticket_number, joined_at in iter_participants(giveaway_id):
+                page.append((user_id, username or "", ticket_number, joined_at.isoformat()))
+                if len(page) >= 1000:
+                    await asyncio.to_thread(writer.writerows, page)
+                    page = []
+            await asyncio.to_thread(writer.writerows, page)
+        await callback.message.answer_document(
+            FSInputFile(path, filename=f"participants_{giveaway_id}.csv"),
+            reply_markup=back_to_giveaway_kb(giveaway_id),
+        )
+    finally:
+        os.unlink(path)
+
+
+def _notify_progress(callback: CallbackQuery):
+    status = None
+
+    async def report(ok: int, fail: int) -> None:
+        nonlocal status
+        text = f"Уведомляю победителей… OK {ok} / FAIL {fail}"
+        try:
+            if status is None:
+                status = await callback.message.answer(text)
+            else:
+                await status.edit_text(text)
+        except Exception:
+            pass
+
+    return report
+
+
+async def _finalize_from_admin(callback: CallbackQuery, giveaway_id: int) -> tuple[list[int], int, int] | None:
+    # Returns None when some winners were left unnotified; their delivery is retried in the background.
+    try:
+        return await finalize_and_notify(
+            callback.bot, giveaway_id, on_progress=_notify_progress(callback), resume=True
+        )
+    except WinnersPending as e:
+        retry_giveaway_end(giveaway_id)
+        await callback.message.answer(
+            f"Уведомления: OK {e.ok} / FAIL {e.fail}\n"
+            f"Не доставлено {e.pending} победителям — повторная отправка запланирована."
+        )
+        return None
+
+
 @router.callback_query(AdminFilter(), lambda c: c.data.startswith("pick:"))
 async def pick(callback: CallbackQuery) -> None:
     giveaway_id = int(callback.data.split(":")[1])
-    winners, ok, fail = await finalize_and_notify(callback.bot, giveaway_id)
+    await callback.answer()
+    result = await _finalize_from_admin(callback, giveaway_id)
+    if result is None:
+        return
+    winners, ok, fail = result
     if not winners:
         await callback.message.answer("Победителей нет (возможно, нет участников).")
-        await callback.answer()
         return
     winners_list = "\n".join([str(u) for u in winners])
     await callback.message.answer(f"Победители:\n{winners_list}\n\nУведомления: OK {ok} / FAIL {fail}")
-    await callback.answer()
 
 
 @router.callback_query(AdminFilter(), lambda c: c.data.startswith("finish:"))
 async def finish(callback: CallbackQuery) -> None:
     giveaway_id = int(callback.data.split(":")[1])
-    winners, ok, fail = await finalize_and_notify(callback.bot, giveaway_id)
+    await callback.answer()
+    result = await _finalize_from_admin(callback, giveaway_id)
+    if result is None:
+        return
+    winners, ok, fail = result
     if not winners:
         await callback.message.answer("Розыгрыш завершен. Победителей нет.")
     else:
         await callback.message.answer(f"Розыгрыш завершен. Победители выбраны.\nУведомления: OK {ok} / FAIL {fail}")
-    await callback.answer()
 
 
 @router.callback_query(AdminFilter(), lambda c: c.data.startswith("edit_desc:"))
@@ -221,9 +317,7 @@ async def summary(callback: CallbackQuery) -> None:
     if not giveaway:
         await callback.answer("Розыгрыш не найден", show_alert=True)
         return
-    count = await participants_count(giveaway_id)
-    wcount = await winners_count(giveaway_id)
-    bcount = await broadcasts_count(giveaway_id)
+    counts = await giveaway_counts(giveaway_id)
     ends = giveaway.ends_at.isoformat() if giveaway.ends_at else "—"
     text = (
         f"Сводка #{giveaway.id}\n"
@@ -232,11 +326,19 @@ async def summary(callback: CallbackQuery) -> None:
         f"Канал: {giveaway.channel_username}\n"
         f"Режим: {giveaway.winners_mode}\n"
         f"Кол-во победителей: {giveaway.winners_count or '—'}\n"
-        f"Участников: {count}\n"
-        f"Победителей: {wcount}\n"
-        f"Рассылок: {bcount}\n"
+        f"Участников: {counts['participants']}\n"
+        f"Победителей: {counts['winners']}\n"
+        f"Рассылок: {counts['broadcasts']}\n"
         f"Окончание (UTC): {ends}"
     )
+    if giveaway.draw_commitment:
+        text += f"\nХэш жеребьёвки: {giveaway.draw_commitment}"
+    elif giveaway.draw_seed:
+        text += "\nХэш жеребьёвки не публиковался до розыгрыша"
+    if giveaway.draw_seed:
+        text += f"\nСекрет: {giveaway.draw_secret}\nSeed ({giveaway.draw_algorithm}): {giveaway.draw_seed}"
+    if giveaway.drawn_at:
+        text += f"\nЖеребьёвка (UTC): {giveaway.drawn_at.isoformat()}"
     await callback.message.answer(text)
     await callback.answer()
 
@@ -252,5 +354,6 @@ async def delete_prompt(callback: CallbackQuery) -> None:
 async def delete_confirm(callback: CallbackQuery) -> None:
     giveaway_id = int(callback.data.split(":")[1])
     await delete_giveaway(giveaway_id)
+    cancel_giveaway_end(giveaway_id)
     await callback.message.answer("Розыгрыш удалён.")
     await callback.answer()
@@ -37,6 +37,20 @@ def admin_giveaway_kb(giveaway_id: int, participants_count: int) -> InlineKeyboa
     )
 
 
+def participants_page_kb(
+    giveaway_id: int, first_id: int, last_id: int, has_prev: bool, has_next: bool
+) -> InlineKeyboardMarkup:
+    nav = []
+    if has_prev:
+        nav.append(InlineKeyboardButton(text="⬅️", callback_data=f"participants_page:{giveaway_id}:prev:{first_id}"))
+    if has_next:
+        nav.append(InlineKeyboardButton(text="➡️", callback_data=f"participants_page:{giveaway_id}:next:{last_id}"))
+    rows = [nav] if nav else []
+    rows.append([InlineKeyboardButton(text="📄 Выгрузить CSV", callback_data=f"participants_csv:{giveaway_id}")])
+    rows.append([InlineKeyboardButton(text="Назад", callback_data=f"admin:{giveaway_id}")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
 def back_to_giveaway_kb(giveaway_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -9,34 +9,55 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from app.config.config import settings
 from app.handlers import start, admin, callbacks, broadcast
-from app.scheduler import set_scheduler, schedule_giveaway_end, set_bot
-from app.services.giveaways import list_active_giveaways, mark_giveaway_finished_if_expired
+from app.scheduler import schedule_giveaway_end, submit_finalization, run_deadlines
+from app.services.giveaways import (
+    list_pending_deadlines,
+    list_unnotified_giveaways,
+    reconcile_counters,
+    refresh_global_stats,
+)
 from app.services.broadcast_jobs import run_broadcast_worker
+from app.services.users import cant_dm_buffer
 
 
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s %(levelname)s %(name)s %(message)s",
 )
+logger = logging.getLogger(__name__)
 
 
 async def _startup_scheduler(bot: Bot) -> AsyncIOScheduler:
     scheduler = AsyncIOScheduler(timezone=timezone.utc)
     scheduler.add_job(
-        mark_giveaway_finished_if_expired,
+        reconcile_counters,
         "interval",
-        minutes=1,
-        id="safety_expired",
-        args=[bot],
+        minutes=30,
+        id="reconcile_counters",
+    )
+    scheduler.add_job(
+        refresh_global_stats,
+        "interval",
+        minutes=5,
+        id="refresh_global_stats",
     )
-    set_scheduler(scheduler)
-    set_bot(bot)
 
-    giveaways = await list_active_giveaways()
+    # Only (id, ends_at) pairs are loaded. Giveaways that ended while the bot was down are
+    # already due and go to the finalizer pool in one batch on the first deadline tick.
     now = datetime.now(timezone.utc)
-    for giveaway in giveaways:
-        if giveaway.ends_at and giveaway.ends_at > now:
-            schedule_giveaway_end(giveaway.id, giveaway.ends_at)
+    overdue = 0
+    for giveaway_id, ends_at in await list_pending_deadlines():
+        schedule_giveaway_end(giveaway_id, ends_at)
+        overdue += ends_at <= now
+    if overdue:
+        logger.info("Catching up %s giveaway(s) that ended during downtime", overdue)
+
+    # A crash mid-notification leaves a FINISHED giveaway with unclaimed winners and no deadline.
+    resumed = await list_unnotified_giveaways()
+    for giveaway_id in resumed:
+        submit_finalization(bot, giveaway_id, resume=True)
+    if resumed:
+        logger.info("Resuming winner notification for giveaway(s) %s", resumed)
     scheduler.start()
     return scheduler
 
@@ -51,7 +72,9 @@ async def main() -> None:
     dp.include_router(broadcast.router)
 
     await _startup_scheduler(bot)
+    asyncio.create_task(run_deadlines(bot))
     asyncio.create_task(run_broadcast_worker(bot))
+    asyncio.create_task(cant_dm_buffer.run())
 
     await dp.start_polling(bot)
 
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Integer, Text, DateTime, String, Boolean, ForeignKey, Index
+from sqlalchemy import Integer, BigInteger, Text, DateTime, String, Boolean, ForeignKey, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 from app.models.base import Base
 
@@ -8,6 +8,7 @@ class BroadcastJob(Base):
     __tablename__ = "broadcast_jobs"
     __table_args__ = (
         Index("ix_broadcast_jobs_status", "status"),
+        Index("ix_broadcast_jobs_open_id", "id", postgresql_where=text("status IN ('PENDING', 'RUNNING')")),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -15,10 +16,12 @@ class BroadcastJob(Base):
     text: Mapped[str] = mapped_column(Text, nullable=False)
     organizer: Mapped[str | None] = mapped_column(String(128))
     is_global: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
-    last_participant_id: Mapped[int | None] = mapped_column(Integer)
-    last_user_id: Mapped[int | None] = mapped_column(Integer)
+    last_participant_id: Mapped[int | None] = mapped_column(BigInteger)
+    last_user_id: Mapped[int | None] = mapped_column(BigInteger)
     sent_ok: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     sent_fail: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     status: Mapped[str] = mapped_column(String(16), nullable=False, default="PENDING")
+    lease_owner: Mapped[str | None] = mapped_column(String(128))
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
@@ -1,11 +1,18 @@
 from datetime import datetime
-from sqlalchemy import String, Text, Integer, DateTime, BigInteger
+from sqlalchemy import String, Text, Integer, DateTime, BigInteger, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 from app.models.base import Base
 
 
 class Giveaway(Base):
     __tablename__ = "giveaways"
+    __table_args__ = (
+        Index(
+            "ix_giveaways_active_ends_at",
+            "ends_at",
+            postgresql_where=text("status = 'ACTIVE' AND ends_at IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     title: Mapped[str] = mapped_column(String(200), nullable=False)
@@ -18,3 +25,8 @@ class Giveaway(Base):
     status: Mapped[str] = mapped_column(String(16), nullable=False, default="ACTIVE")
     created_by: Mapped[int] = mapped_column(BigInteger, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    draw_commitment: Mapped[str | None] = mapped_column(String(64))  # sha256(draw_secret), published up front
+    draw_secret: Mapped[str | None] = mapped_column(String(64))
+    draw_seed: Mapped[str | None] = mapped_column(String(64))
+    draw_algorithm: Mapped[str | None] = mapped_column(String(32))
+    drawn_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))  # later joins are not in the draw
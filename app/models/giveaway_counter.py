@@ -0,0 +1,18 @@
+from sqlalchemy import BigInteger, SmallInteger, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from app.models.base import Base
+
+COUNTER_SLOTS = 16
+
+
+class GiveawayCounter(Base):
+    # Maintained by statement-level triggers on participants/winners/broadcasts. Each write
+    # bumps one of COUNTER_SLOTS rows per giveaway so concurrent joins don't queue on a single
+    # row lock; a giveaway's count is the sum over its slots.
+    __tablename__ = "giveaway_counters"
+
+    giveaway_id: Mapped[int] = mapped_column(ForeignKey("giveaways.id", ondelete="CASCADE"), primary_key=True)
+    slot: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    participants: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    winners: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    broadcasts: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
@@ -1,5 +1,7 @@
 from datetime import datetime
-from sqlalchemy import String, Integer, DateTime, Boolean, ForeignKey, UniqueConstraint, Index, BigInteger
+from sqlalchemy import (
+    String, Integer, DateTime, Boolean, ForeignKey, UniqueConstraint, Index, BigInteger, FetchedValue, text,
+)
 from sqlalchemy.orm import Mapped, mapped_column
 from app.models.base import Base
 
@@ -8,13 +10,22 @@ class Participant(Base):
     __tablename__ = "participants"
     __table_args__ = (
         UniqueConstraint("giveaway_id", "user_id", name="uq_participants_giveaway_user"),
+        UniqueConstraint("giveaway_id", "ticket_number", name="uq_participants_giveaway_ticket"),
         Index("ix_participants_giveaway_id", "giveaway_id"),
+        Index(
+            "ix_participants_giveaway_can_dm_id",
+            "giveaway_id",
+            "id",
+            postgresql_include=["user_id"],
+            postgresql_where=text("can_dm"),
+        ),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     giveaway_id: Mapped[int] = mapped_column(ForeignKey("giveaways.id", ondelete="CASCADE"), nullable=False)
     user_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
     username: Mapped[str | None] = mapped_column(String(64))
-    ticket_number: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Assigned by the participants_set_ticket trigger from a permutation of id.
+    ticket_number: Mapped[int] = mapped_column(Integer, nullable=False, server_default=FetchedValue())
     joined_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     can_dm: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
@@ -0,0 +1,10 @@
+from sqlalchemy import String, Float
+from sqlalchemy.orm import Mapped, mapped_column
+from app.models.base import Base
+
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    tat: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)  # unix epoch seconds
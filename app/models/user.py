@@ -1,12 +1,15 @@
 from datetime import datetime
-from sqlalchemy import BigInteger, String, DateTime, Boolean, Integer, UniqueConstraint
+from sqlalchemy import BigInteger, String, DateTime, Boolean, Integer, UniqueConstraint, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 from app.models.base import Base
 
 
 class User(Base):
     __tablename__ = "users"
-    __table_args__ = (UniqueConstraint("user_id", name="uq_users_user_id"),)
+    __table_args__ = (
+        UniqueConstraint("user_id", name="uq_users_user_id"),
+        Index("ix_users_can_dm_user_id", "user_id", postgresql_where=text("can_dm")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
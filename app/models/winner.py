@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Integer, DateTime, ForeignKey, Index, BigInteger
+from sqlalchemy import Integer, DateTime, ForeignKey, Index, BigInteger, text
 from sqlalchemy.orm import Mapped, mapped_column
 from app.models.base import Base
 
@@ -8,9 +8,11 @@ class Winner(Base):
     __tablename__ = "winners"
     __table_args__ = (
         Index("ix_winners_giveaway_id", "giveaway_id"),
+        Index("ix_winners_giveaway_unnotified_id", "giveaway_id", "id", postgresql_where=text("notified_at IS NULL")),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     giveaway_id: Mapped[int] = mapped_column(ForeignKey("giveaways.id", ondelete="CASCADE"), nullable=False)
     user_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
     picked_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    notified_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
@@ -1,43 +1,122 @@
-from datetime import datetime
-from typing import Optional
-
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta, timezone
 
 from aiogram import Bot
-from app.services.giveaways import finalize_giveaway, finalize_and_notify
+from app.services.finalizer import finalizer_pool
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineScheduler:
+    # Min-heap of (ends_at timestamp, giveaway_id). The runner sleeps until the earliest
+    # deadline or until an earlier one is scheduled, so it issues no queries while idle.
+    # Rescheduling and cancelling are lazy: `_deadlines` holds the live deadline per giveaway
+    # and heap entries that no longer match it are skipped when they surface.
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, int]] = []
+        self._deadlines: dict[int, float] = {}
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def schedule(self, giveaway_id: int, ends_at: datetime | None) -> None:
+        if ends_at is None:
+            self.cancel(giveaway_id)
+            return
+        deadline = ends_at.timestamp()
+        if self._deadlines.get(giveaway_id) == deadline:
+            return
+        self._deadlines[giveaway_id] = deadline
+        heapq.heappush(self._heap, (deadline, giveaway_id))
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._compact()
+        if self._heap[0] == (deadline, giveaway_id):
+            self._wakeup.set()
 
-_scheduler: Optional[AsyncIOScheduler] = None
-_bot: Optional[Bot] = None
+    def cancel(self, giveaway_id: int) -> None:
+        self._deadlines.pop(giveaway_id, None)
 
+    def pop_due(self, now: float) -> list[int]:
+        due: list[int] = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, giveaway_id = heapq.heappop(self._heap)
+            if self._deadlines.get(giveaway_id) == deadline:
+                del self._deadlines[giveaway_id]
+                due.append(giveaway_id)
+        return due
 
-def set_scheduler(scheduler: AsyncIOScheduler) -> None:
-    global _scheduler
-    _scheduler = scheduler
+    def next_delay(self, now: float) -> float | None:
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - now)
 
+    def _compact(self) -> None:
+        self._heap = [(deadline, giveaway_id) for giveaway_id, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
 
-def set_bot(bot: Bot) -> None:
-    global _bot
-    _bot = bot
+    async def run(self, on_due) -> None:
+        while True:
+            self._wakeup.clear()
+            now = datetime.now(timezone.utc).timestamp()
+            due = self.pop_due(now)
+            for giveaway_id in due:
+                on_due(giveaway_id)
+            if due:
+                logger.info("Giveaway deadline(s) reached: %s", due)
+            delay = self.next_delay(now)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+_deadlines = DeadlineScheduler()
+# Consecutive failed finalizations per giveaway, for the retry backoff.
+_failures: dict[int, int] = {}
 
 
 def schedule_giveaway_end(giveaway_id: int, ends_at: datetime | None) -> None:
-    if not ends_at or _scheduler is None:
-        return
-    if _bot is not None:
-        _scheduler.add_job(
-            finalize_and_notify,
-            "date",
-            run_date=ends_at,
-            args=[_bot, giveaway_id],
-            id=f"giveaway_{giveaway_id}",
-            replace_existing=True,
-        )
+    _deadlines.schedule(giveaway_id, ends_at)
+
+
+def cancel_giveaway_end(giveaway_id: int) -> None:
+    _deadlines.cancel(giveaway_id)
+    _failures.pop(giveaway_id, None)
+
+
+def _retry_delay(failures: int) -> float:
+    return min(30.0 * 2 ** (failures - 1), 900.0)
+
+
+def _on_result(giveaway_id: int, succeeded: bool) -> None:
+    if succeeded:
+        _failures.pop(giveaway_id, None)
         return
-    _scheduler.add_job(
-        finalize_giveaway,
-        "date",
-        run_date=ends_at,
-        args=[giveaway_id],
-        id=f"giveaway_{giveaway_id}",
-        replace_existing=True,
+    retry_giveaway_end(giveaway_id)
+
+
+def retry_giveaway_end(giveaway_id: int) -> None:
+    # Re-arms the deadline of a giveaway whose finalization failed or left winners unnotified,
+    # with backoff; the retry runs with resume=True.
+    failures = _failures.get(giveaway_id, 0) + 1
+    _failures[giveaway_id] = failures
+    delay = _retry_delay(failures)
+    logger.warning("Retrying giveaway %s finalization in %.0fs (attempt %s)", giveaway_id, delay, failures + 1)
+    _deadlines.schedule(giveaway_id, datetime.now(timezone.utc) + timedelta(seconds=delay))
+
+
+def submit_finalization(bot: Bot, giveaway_id: int, resume: bool = False) -> bool:
+    return finalizer_pool.submit(
+        bot, giveaway_id, resume=resume or giveaway_id in _failures, on_result=_on_result
     )
+
+
+async def run_deadlines(bot: Bot) -> None:
+    # A due deadline leaves the heap before its finalization runs, so a failed or timed-out
+    # finalization re-arms it with backoff; retries resume notification of a drawn giveaway.
+    await _deadlines.run(lambda giveaway_id: submit_finalization(bot, giveaway_id))
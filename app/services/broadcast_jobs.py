@@ -1,23 +1,32 @@
 import asyncio
 import logging
-from datetime import datetime, timezone
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone, timedelta
 
-from sqlalchemy import select, update, asc
+from sqlalchemy import select, update, asc, or_, func
 from sqlalchemy.exc import IntegrityError
 from aiogram import Bot
-from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest, TelegramRetryAfter
 
+from app.db.listener import NotifyListener
 from app.db.session import AsyncSessionLocal
 from app.models.broadcast_job import BroadcastJob
 from app.models.participant import Participant
 from app.models.user import User
-from app.services.sender import send_message_limited
+from app.services.delivery import DEFERRED, DELIVERED, deliver, run_lanes
 from app.utils.telegram import contact_button_markup
-from app.services.users import mark_user_cant_dm
-from sqlalchemy import update
+from app.services.users import cant_dm_buffer
 
 logger = logging.getLogger(__name__)
 
+JOBS_CHANNEL = "broadcast_jobs"
+# A recipient deferred by a flood limit or a transport error is retried in place this many
+# times (each retry first waits for the shared limiter's pause) before counting as failed.
+DEFERRED_RETRIES = 5
+
 
 async def create_broadcast_job(
     text: str,
@@ -51,6 +60,8 @@ async def create_broadcast_job(
             updated_at=datetime.now(timezone.utc),
         )
         session.add(job)
+        # Delivered to listening workers only once the transaction commits.
+        await session.execute(select(func.pg_notify(JOBS_CHANNEL, "")))
         try:
             await session.commit()
         except IntegrityError:
@@ -60,120 +71,275 @@ async def create_broadcast_job(
         return job
 
 
-async def fetch_next_job() -> BroadcastJob | None:
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(BroadcastJob).where(BroadcastJob.status.in_(["PENDING", "RUNNING"])).order_by(asc(BroadcastJob.id))
+def claimable_jobs_query(now: datetime):
+    return (
+        select(BroadcastJob)
+        .where(
+            BroadcastJob.status.in_(["PENDING", "RUNNING"]),
+            or_(BroadcastJob.lease_expires_at == None, BroadcastJob.lease_expires_at < now),
         )
-        return result.scalars().first()
+        .order_by(asc(BroadcastJob.id))
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
 
 
-async def update_job(job_id: int, **fields) -> None:
+async def claim_next_job(worker_id: str, lease_seconds: float) -> BroadcastJob | None:
+    # SKIP LOCKED lets concurrent workers/replicas each claim a different job; a RUNNING job
+    # is only taken over once its owner stopped renewing the lease.
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(claimable_jobs_query(now))
+        job = result.scalar_one_or_none()
+        if not job:
+            return None
+        if job.lease_owner:
+            logger.warning("Reclaiming broadcast job %s from expired lease of %s", job.id, job.lease_owner)
+        job.status = "RUNNING"
+        job.lease_owner = worker_id
+        job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+        job.updated_at = now
+        await session.commit()
+        return job
+
+
+async def update_job(job_id: int, owner: str | None = None, **fields) -> bool:
     fields["updated_at"] = datetime.now(timezone.utc)
+    query = update(BroadcastJob).where(BroadcastJob.id == job_id)
+    if owner is not None:
+        query = query.where(BroadcastJob.lease_owner == owner)
     async with AsyncSessionLocal() as session:
-        await session.execute(update(BroadcastJob).where(BroadcastJob.id == job_id).values(**fields))
+        result = await session.execute(query.values(**fields))
         await session.commit()
+        return bool(result.rowcount)
+
 
+def global_targets_query(cursor: int | None, page_size: int):
+    query = select(User.user_id).where(User.can_dm == True)
+    if cursor:
+        query = query.where(User.user_id > cursor)
+    return query.order_by(User.user_id.asc()).limit(page_size)
+
+
+def giveaway_targets_query(giveaway_id: int, cursor: int | None, page_size: int):
+    query = (
+        select(Participant.id, Participant.user_id)
+        .join(User, User.user_id == Participant.user_id)
+        .where(
+            Participant.giveaway_id == giveaway_id,
+            Participant.can_dm == True,
+            User.can_dm == True,
+        )
+    )
+    if cursor:
+        query = query.where(Participant.id > cursor)
+    return query.order_by(Participant.id.asc()).limit(page_size)
 
-async def _iter_targets(job: BroadcastJob):
+
+async def _iter_targets(job: BroadcastJob, page_size: int = 1000):
+    # Keyset pagination: each page is fetched in its own short session, so the
+    # connection goes back to the pool between pages and memory stays at one page.
     if job.is_global:
+        cursor = job.last_user_id
+        while True:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(global_targets_query(cursor, page_size))
+                rows = result.all()
+            for (user_id,) in rows:
+                yield user_id, user_id
+            if len(rows) < page_size:
+                return
+            cursor = rows[-1][0]
+
+    cursor = job.last_participant_id
+    while True:
         async with AsyncSessionLocal() as session:
-            query = select(User.user_id).where(User.can_dm == True)
-            if job.last_user_id:
-                query = query.where(User.user_id > job.last_user_id)
-            query = query.order_by(User.user_id.asc())
-            result = await session.execute(query)
-            for (user_id,) in result.all():
-                yield user_id
-        return
+            result = await session.execute(giveaway_targets_query(job.giveaway_id, cursor, page_size))
+            rows = result.all()
+        for pid, user_id in rows:
+            yield pid, user_id
+        if len(rows) < page_size:
+            return
+        cursor = rows[-1][0]
 
-    async with AsyncSessionLocal() as session:
-        query = (
-            select(Participant.id, Participant.user_id)
-            .join(User, User.user_id == Participant.user_id)
-            .where(
-                Participant.giveaway_id == job.giveaway_id,
-                Participant.can_dm == True,
-                User.can_dm == True,
+
+class _CursorTracker:
+    # Targets are dispatched in ascending key order but may complete out of order,
+    # so the resume cursor only moves past a key once everything before it is done.
+    def __init__(self, position: int | None) -> None:
+        self.position = position
+        self._in_flight: deque[int] = deque()
+        self._done: set[int] = set()
+
+    def start(self, key: int) -> None:
+        self._in_flight.append(key)
+
+    def finish(self, key: int) -> None:
+        self._done.add(key)
+        while self._in_flight and self._in_flight[0] in self._done:
+            self.position = self._in_flight.popleft()
+            self._done.discard(self.position)
+
+
+class _LeaseLost(Exception):
+    pass
+
+
+class _ProgressCheckpoint:
+    # Keeps counters and the resume cursor in memory and writes them to broadcast_jobs
+    # every `flush_every` recipients or `flush_interval` seconds, whichever comes first.
+    # Every write also renews the job lease and fails if another worker has taken it over.
+    def __init__(
+        self,
+        job: BroadcastJob,
+        cursor_field: str,
+        tracker: _CursorTracker,
+        worker_id: str,
+        lease_seconds: float,
+        flush_every: int,
+        flush_interval: float,
+    ) -> None:
+        self._job = job
+        self._worker_id = worker_id
+        self._lease_seconds = lease_seconds
+        self._cursor_field = cursor_field
+        self._tracker = tracker
+        self._flush_every = flush_every
+        self._flush_interval = flush_interval
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def record(self) -> None:
+        self._pending += 1
+        if self._pending >= self._flush_every or time.monotonic() - self._last_flush >= self._flush_interval:
+            await self.flush()
+
+    async def flush(self, **fields) -> None:
+        # Serialized so an older snapshot can never be committed after a newer one.
+        async with self._lock:
+            self._pending = 0
+            self._last_flush = time.monotonic()
+            fields.setdefault(
+                "lease_expires_at", datetime.now(timezone.utc) + timedelta(seconds=self._lease_seconds)
             )
-        )
-        if job.last_participant_id:
-            query = query.where(Participant.id > job.last_participant_id)
-        query = query.order_by(Participant.id.asc())
-        result = await session.execute(query)
-        for pid, user_id in result.all():
-            yield pid, user_id
+            owned = await update_job(
+                self._job.id,
+                owner=self._worker_id,
+                sent_ok=self._job.sent_ok,
+                sent_fail=self._job.sent_fail,
+                **{self._cursor_field: self._tracker.position},
+                **fields,
+            )
+            if not owned:
+                raise _LeaseLost(self._job.id)
 
 
-async def run_broadcast_worker(bot: Bot, throttle_delay: float = 0.12) -> None:
-    while True:
-        job = await fetch_next_job()
-        if not job:
-            await asyncio.sleep(1.0)
-            continue
-
-        await update_job(job.id, status="RUNNING")
-        text = (
-            "📣 <b>Сообщение от организатора:</b>\n"
-            f"<b>{job.organizer or ''}</b>\n\n"
-            f"{job.text}"
-        )
-        reply_markup = contact_button_markup(text)
-
-        if job.is_global:
-            async for user_id in _iter_targets(job):
-                try:
-                    await send_message_limited(bot, user_id, text, reply_markup=reply_markup, user_id=user_id)
-                    job.sent_ok += 1
-                    job.last_user_id = user_id
-                except TelegramRetryAfter as e:
-                    logger.warning("RetryAfter %s sec", e.retry_after)
-                    await asyncio.sleep(float(e.retry_after))
-                except (TelegramForbiddenError, TelegramBadRequest):
-                    job.sent_fail += 1
-                    await mark_user_cant_dm(user_id)
-                except Exception:
-                    job.sent_fail += 1
-                await update_job(
-                    job.id,
-                    sent_ok=job.sent_ok,
-                    sent_fail=job.sent_fail,
-                    last_user_id=job.last_user_id,
-                )
-                await asyncio.sleep(throttle_delay)
+async def _run_job(
+    bot: Bot,
+    job: BroadcastJob,
+    worker_id: str,
+    concurrency: int,
+    lease_seconds: float,
+    flush_every: int,
+    flush_interval: float,
+) -> None:
+    text = (
+        "📣 <b>Сообщение от организатора:</b>\n"
+        f"<b>{job.organizer or ''}</b>\n\n"
+        f"{job.text}"
+    )
+    reply_markup = contact_button_markup(text)
+    cursor_field = "last_user_id" if job.is_global else "last_participant_id"
+    tracker = _CursorTracker(getattr(job, cursor_field))
+    checkpoint = _ProgressCheckpoint(
+        job, cursor_field, tracker, worker_id, lease_seconds, flush_every, flush_interval
+    )
+    delivered = asyncio.Event()
+
+    async def targets():
+        async for key, user_id in _iter_targets(job):
+            tracker.start(key)
+            yield key, user_id
+
+    async def send(target: tuple[int, int]) -> None:
+        # The key is finished only once the recipient is delivered or given up on, so the
+        # checkpoint cursor never moves past a recipient that is still being retried.
+        key, user_id = target
+        for attempt in range(DEFERRED_RETRIES + 1):
+            result = await deliver(bot, user_id, text, reply_markup=reply_markup)
+            if result != DEFERRED:
+                break
+            if attempt < DEFERRED_RETRIES:
+                await asyncio.sleep(min(2.0 ** attempt, 30.0))
+        else:
+            logger.warning("Broadcast job %s: giving up on user %s after %s retries", job.id, user_id, DEFERRED_RETRIES)
+        if result == DELIVERED:
+            job.sent_ok += 1
         else:
-            async for pid, user_id in _iter_targets(job):
-                try:
-                    await send_message_limited(bot, user_id, text, reply_markup=reply_markup, user_id=user_id)
-                    job.sent_ok += 1
-                    job.last_participant_id = pid
-                except TelegramRetryAfter as e:
-                    logger.warning("RetryAfter %s sec", e.retry_after)
-                    await asyncio.sleep(float(e.retry_after))
-                except (TelegramForbiddenError, TelegramBadRequest):
-                    job.sent_fail += 1
-                    await mark_user_cant_dm(user_id)
-                    await _mark_participant_cant_dm(job.giveaway_id, user_id)
-                except Exception:
-                    job.sent_fail += 1
-                await update_job(
-                    job.id,
-                    sent_ok=job.sent_ok,
-                    sent_fail=job.sent_fail,
-                    last_participant_id=job.last_participant_id,
-                )
-                await asyncio.sleep(throttle_delay)
-
-        await update_job(job.id, status="DONE")
-
-
-async def _mark_participant_cant_dm(giveaway_id: int | None, user_id: int) -> None:
-    if not giveaway_id:
+            job.sent_fail += 1
+        tracker.finish(key)
+        await checkpoint.record()
+
+    async def drain() -> None:
+        await run_lanes(targets(), send, concurrency)
+        delivered.set()
+
+    async def heartbeat() -> None:
+        # Keeps the lease alive while every lane is parked on the rate limiter.
+        while True:
+            try:
+                await asyncio.wait_for(delivered.wait(), timeout=lease_seconds / 3)
+                return
+            except asyncio.TimeoutError:
+                await checkpoint.flush()
+
+    lease_lost = False
+    try:
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(drain())
+                group.create_task(heartbeat())
+        except* _LeaseLost:
+            lease_lost = True
+    except BaseException:
+        # Hand the job back right away instead of letting other workers wait for the lease to expire.
+        await checkpoint.flush(lease_owner=None, lease_expires_at=None)
+        raise
+    if lease_lost:
+        logger.warning("Lost lease on broadcast job %s, another worker has taken it over", job.id)
         return
-    async with AsyncSessionLocal() as session:
-        await session.execute(
-            update(Participant)
-            .where(Participant.giveaway_id == giveaway_id, Participant.user_id == user_id)
-            .values(can_dm=False)
-        )
-        await session.commit()
+    await cant_dm_buffer.flush()
+    try:
+        await checkpoint.flush(status="DONE", lease_owner=None, lease_expires_at=None)
+    except _LeaseLost:
+        logger.warning("Lost lease on broadcast job %s before it was marked DONE", job.id)
+
+
+def _default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def run_broadcast_worker(
+    bot: Bot,
+    worker_id: str | None = None,
+    concurrency: int = 8,
+    lease_seconds: float = 60.0,
+    flush_every: int = 100,
+    flush_interval: float = 2.0,
+    fallback_poll: float = 30.0,
+) -> None:
+    # Idles on LISTEN instead of polling; the slow fallback poll also catches expired leases
+    # of crashed workers, which don't produce a notification.
+    worker_id = worker_id or _default_worker_id()
+    listener = NotifyListener(JOBS_CHANNEL)
+    try:
+        while True:
+            job = await claim_next_job(worker_id, lease_seconds)
+            if not job:
+                await listener.wait(timeout=fallback_poll)
+                continue
+
+            await _run_job(bot, job, worker_id, concurrency, lease_seconds, flush_every, flush_interval)
+    finally:
+        await listener.close()
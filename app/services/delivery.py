@@ -0,0 +1,70 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+
+from app.services.sender import send_message_limited
+from app.services.users import cant_dm_buffer
+from app.utils.ratelimiter import PRIORITY_BULK
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+DELIVERED = "delivered"
+UNREACHABLE = "unreachable"  # blocked the bot / chat gone: final
+DEFERRED = "deferred"  # flood limit or transport error: worth retrying later
+
+
+async def deliver(
+    bot: Bot,
+    user_id: int,
+    text: str,
+    reply_markup: InlineKeyboardMarkup | None = None,
+) -> str:
+    try:
+        await send_message_limited(
+            bot, user_id, text, reply_markup=reply_markup, user_id=user_id, priority=PRIORITY_BULK
+        )
+        return DELIVERED
+    except TelegramRetryAfter as e:
+        # The shared limiter has already been paused by send_message_limited.
+        logger.warning("RetryAfter %s sec, deferring user %s", e.retry_after, user_id)
+    except (TelegramForbiddenError, TelegramBadRequest):
+        cant_dm_buffer.add(user_id)
+        return UNREACHABLE
+    except Exception:
+        logger.debug("Failed to deliver message to user %s", user_id, exc_info=True)
+    return DEFERRED
+
+
+async def run_lanes(
+    source: AsyncIterator[T],
+    handle: Callable[[T], Awaitable[None]],
+    concurrency: int,
+) -> None:
+    # A bounded pool of `concurrency` coroutines draining `source`; the rate limiter behind
+    # send_message_limited is the only throttle. Any failure cancels the whole pool.
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def feed() -> None:
+        async for item in source:
+            await queue.put(item)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def lane() -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            await handle(item)
+
+    async with asyncio.TaskGroup() as group:
+        group.create_task(feed())
+        for _ in range(concurrency):
+            group.create_task(lane())
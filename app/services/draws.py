@@ -0,0 +1,36 @@
+import hashlib
+import secrets
+
+from sqlalchemy import func
+
+from app.models.participant import Participant
+
+# Winners are the `k` participants with the smallest md5("<seed>:<user_id>") hex digest
+# (ties broken by user_id). The ranking depends only on the seed and the set of user ids,
+# never on row order, so anyone holding the seed and the participant list as of the recorded
+# draw time (giveaways.drawn_at) can redo the draw.
+DRAW_ALGORITHM = "md5-rank-v1"
+
+
+def new_draw_secret() -> tuple[str, str]:
+    # The commitment (sha256 of the secret) is published when the giveaway is created;
+    # revealing the secret after the draw proves the seed wasn't chosen after the fact.
+    secret = secrets.token_hex(32)
+    return secret, hashlib.sha256(secret.encode()).hexdigest()
+
+
+def commitment_matches(secret: str, commitment: str) -> bool:
+    return hashlib.sha256(secret.encode()).hexdigest() == commitment
+
+
+def derive_seed(secret: str, giveaway_id: int) -> str:
+    return hashlib.sha256(f"{secret}:{giveaway_id}".encode()).hexdigest()
+
+
+def rank_key(seed: str, user_id: int) -> str:
+    return hashlib.md5(f"{seed}:{user_id}".encode()).hexdigest()
+
+
+def rank_order(seed: str) -> tuple:
+    # SQL twin of rank_key; the "C" collation makes text ordering plain byte ordering.
+    return func.md5(func.concat(seed, ":", Participant.user_id)).collate("C"), Participant.user_id
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import time
+from typing import Callable
+
+from aiogram import Bot
+
+from app.services.giveaways import WinnersPending, finalize_and_notify
+
+logger = logging.getLogger(__name__)
+
+
+class FinalizerPool:
+    # Runs finalize_and_notify for expired giveaways in the background, at most `concurrency`
+    # at a time. A giveaway already queued or running is not submitted twice, so a slow one
+    # never blocks the sweep or the others. A timeout or a deferred send mid-notification
+    # releases the unsent winners' claims and counts as a failure, so a retry with resume=True
+    # picks up where this run stopped. The claim re-checks ends_at, so a deadline moved after
+    # the giveaway was queued does not draw it early.
+    def __init__(self, concurrency: int = 4, timeout: float = 1800.0) -> None:
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._timeout = timeout
+        self._tasks: dict[int, asyncio.Task] = {}
+        self._progress: dict[int, tuple[float | None, int, int]] = {}
+
+    def submit(
+        self,
+        bot: Bot,
+        giveaway_id: int,
+        resume: bool = False,
+        on_result: Callable[[int, bool], None] | None = None,
+    ) -> bool:
+        # on_result(giveaway_id, succeeded) is called once the finalization has finished or failed.
+        if giveaway_id in self._tasks:
+            return False
+        self._progress[giveaway_id] = (None, 0, 0)
+        task = asyncio.create_task(self._run(bot, giveaway_id, resume, on_result))
+        self._tasks[giveaway_id] = task
+        task.add_done_callback(lambda _: self._forget(giveaway_id))
+        return True
+
+    def progress(self) -> dict[int, tuple[float | None, int, int]]:
+        # giveaway_id -> (seconds running or None while queued, sent ok, failed)
+        now = time.monotonic()
+        return {
+            giveaway_id: (None if started is None else now - started, ok, fail)
+            for giveaway_id, (started, ok, fail) in self._progress.items()
+        }
+
+    async def _run(
+        self, bot: Bot, giveaway_id: int, resume: bool, on_result: Callable[[int, bool], None] | None
+    ) -> None:
+        succeeded = await self._finalize(bot, giveaway_id, resume)
+        if on_result is not None:
+            on_result(giveaway_id, succeeded)
+
+    async def _finalize(self, bot: Bot, giveaway_id: int, resume: bool) -> bool:
+        async with self._semaphore:
+            started = time.monotonic()
+            self._progress[giveaway_id] = (started, 0, 0)
+
+            async def on_progress(ok: int, fail: int) -> None:
+                self._progress[giveaway_id] = (started, ok, fail)
+
+            try:
+                winners, ok, fail = await asyncio.wait_for(
+                    finalize_and_notify(
+                        bot, giveaway_id, on_progress=on_progress, resume=resume, only_if_due=True
+                    ),
+                    self._timeout,
+                )
+            except WinnersPending as e:
+                logger.warning(
+                    "Giveaway %s: %s winner(s) still to notify after OK %s / FAIL %s",
+                    giveaway_id, e.pending, e.ok, e.fail,
+                )
+                return False
+            except asyncio.TimeoutError:
+                logger.error("Giveaway %s: finalization timed out after %.0fs", giveaway_id, self._timeout)
+                return False
+            except Exception:
+                logger.exception("Giveaway %s: finalization failed", giveaway_id)
+                return False
+            logger.info(
+                "Giveaway %s finalized in %.1fs: %s winner(s), OK %s / FAIL %s",
+                giveaway_id, time.monotonic() - started, len(winners), ok, fail,
+            )
+            return True
+
+    def _forget(self, giveaway_id: int) -> None:
+        self._tasks.pop(giveaway_id, None)
+        self._progress.pop(giveaway_id, None)
+
+
+finalizer_pool = FinalizerPool()
+
@@ -1,24 +1,46 @@
-import random
-import asyncio
+import logging
+import time
 from datetime import datetime, timezone
-from typing import Sequence
+from typing import Awaitable, Callable, Sequence
 
 from aiogram import Bot
-from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
-from sqlalchemy import select, update, func, delete, distinct
-from sqlalchemy.exc import IntegrityError
+from aiogram.exceptions import TelegramBadRequest
+from sqlalchemy import select, update, insert, func, delete, literal, text, true, BigInteger, DateTime, String
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.db.session import AsyncSessionLocal
 from app.models.giveaway import Giveaway
+from app.models.giveaway_counter import GiveawayCounter
 from app.models.participant import Participant
 from app.models.winner import Winner
-from app.models.broadcast import Broadcast
+from app.utils.cache import TtlCache
 from app.utils.telegram import contact_button_markup
-from app.services.sender import send_message_limited
-from app.services.users import mark_user_cant_dm
+from app.services.delivery import DEFERRED, DELIVERED, UNREACHABLE, deliver, run_lanes
+from app.services.draws import DRAW_ALGORITHM, new_draw_secret, derive_seed, rank_order
 
+logger = logging.getLogger(__name__)
 
-async def check_subscription(bot: Bot, channel_username: str, user_id: int) -> bool:
+
+class WinnersPending(Exception):
+    # Raised by notify_winners when some claimed winners could not be messaged (flood limit or
+    # transport error). Their claims are already released; a run with resume=True retries them.
+    def __init__(self, giveaway_id: int, ok: int, fail: int, pending: int) -> None:
+        super().__init__(f"giveaway {giveaway_id}: {pending} winner(s) not notified")
+        self.giveaway_id = giveaway_id
+        self.ok = ok
+        self.fail = fail
+        self.pending = pending
+
+
+# "Not subscribed" is cached only briefly so a user who has just subscribed can re-check quickly.
+_subscriptions = TtlCache(maxsize=50_000, ttl=120.0, negative_ttl=5.0)
+
+
+def subscription_cache_stats() -> dict[str, int]:
+    return _subscriptions.stats()
+
+
+async def _fetch_subscription(bot: Bot, channel_username: str, user_id: int) -> bool:
     try:
         member = await bot.get_chat_member(chat_id=channel_username, user_id=user_id)
     except TelegramBadRequest:
@@ -26,16 +48,53 @@ async def check_subscription(bot: Bot, channel_username: str, user_id: int) -> b
     return member.status in {"member", "administrator", "creator"}
 
 
-async def get_giveaway(giveaway_id: int) -> Giveaway | None:
+async def check_subscription(bot: Bot, channel_username: str, user_id: int) -> bool:
+    return await _subscriptions.get_or_load(
+        (channel_username.lower(), user_id), lambda: _fetch_subscription(bot, channel_username, user_id)
+    )
+
+
+# Detached Giveaway rows shared between handlers, which only read them. Every write path
+# below invalidates its entry; the TTL bounds staleness from writes made by other processes.
+_giveaways = TtlCache(maxsize=1024, ttl=300.0, negative_ttl=5.0)
+
+
+async def _load_giveaway(giveaway_id: int) -> Giveaway | None:
     async with AsyncSessionLocal() as session:
         result = await session.execute(select(Giveaway).where(Giveaway.id == giveaway_id))
         return result.scalar_one_or_none()
 
 
-async def list_active_giveaways() -> Sequence[Giveaway]:
+async def get_giveaway(giveaway_id: int) -> Giveaway | None:
+    return await _giveaways.get_or_load(giveaway_id, lambda: _load_giveaway(giveaway_id))
+
+
+def pending_deadlines_query():
+    return (
+        select(Giveaway.id, Giveaway.ends_at)
+        .where(Giveaway.status == "ACTIVE", Giveaway.ends_at != None)
+        .order_by(Giveaway.ends_at.asc())
+    )
+
+
+async def list_pending_deadlines() -> list[tuple[int, datetime]]:
+    # (id, ends_at) of active giveaways with an end date, soonest first; served by ix_giveaways_active_ends_at.
     async with AsyncSessionLocal() as session:
-        result = await session.execute(select(Giveaway).where(Giveaway.status == "ACTIVE"))
-        return result.scalars().all()
+        result = await session.execute(pending_deadlines_query())
+        return [(giveaway_id, ends_at) for giveaway_id, ends_at in result.all()]
+
+
+async def list_unnotified_giveaways() -> list[int]:
+    # Finished giveaways with winners still waiting for their message, e.g. after a crash
+    # mid-notification; served by ix_winners_giveaway_unnotified_id.
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(Winner.giveaway_id)
+            .join(Giveaway, Giveaway.id == Winner.giveaway_id)
+            .where(Winner.notified_at == None, Giveaway.status == "FINISHED")
+            .distinct()
+        )
+        return list(result.scalars().all())
 
 
 async def list_all_giveaways() -> Sequence[Giveaway]:
@@ -45,187 +104,415 @@ async def list_all_giveaways() -> Sequence[Giveaway]:
 
 
 async def global_stats() -> dict:
+    # Served from the global_stats_snapshot materialized view; see refresh_global_stats.
     async with AsyncSessionLocal() as session:
-        total_giveaways = await session.execute(select(func.count()).select_from(Giveaway))
-        active_giveaways = await session.execute(
-            select(func.count()).select_from(Giveaway).where(Giveaway.status == "ACTIVE")
-        )
-        finished_giveaways = await session.execute(
-            select(func.count()).select_from(Giveaway).where(Giveaway.status == "FINISHED")
-        )
-        total_participants = await session.execute(
-            select(func.count(distinct(Participant.user_id))).select_from(Participant)
-        )
-        can_dm_users = await session.execute(
-            select(func.count(distinct(Participant.user_id))).select_from(Participant).where(Participant.can_dm == True)
+        result = await session.execute(
+            text(
+                "SELECT giveaways_total, giveaways_active, giveaways_finished, participants_total, "
+                "participants_can_dm, winners_total, broadcasts_total, refreshed_at FROM global_stats_snapshot"
+            )
         )
-        total_winners = await session.execute(select(func.count()).select_from(Winner))
-        total_broadcasts = await session.execute(select(func.count()).select_from(Broadcast))
+        row = result.mappings().one()
+        stats = {key: int(value) for key, value in row.items() if key != "refreshed_at"}
+        stats["refreshed_at"] = row["refreshed_at"]
+        return stats
+
 
-        return {
-            "giveaways_total": int(total_giveaways.scalar_one()),
-            "giveaways_active": int(active_giveaways.scalar_one()),
-            "giveaways_finished": int(finished_giveaways.scalar_one()),
-            "participants_total": int(total_participants.scalar_one()),
-            "participants_can_dm": int(can_dm_users.scalar_one()),
-            "winners_total": int(total_winners.scalar_one()),
-            "broadcasts_total": int(total_broadcasts.scalar_one()),
-        }
+# Advisory lock key held by the process refreshing global_stats_snapshot.
+_STATS_REFRESH_LOCK = 0x676C6F62
 
 
-async def add_participant(giveaway_id: int, user_id: int, username: str | None) -> bool:
+async def refresh_global_stats(max_age: float = 240.0) -> bool:
+    # CONCURRENTLY keeps the admin screen readable while the distinct counts are recomputed.
+    # Every bot process schedules this job, so only the one holding the advisory lock refreshes,
+    # and only if the snapshot is older than max_age (a bit under the job interval, so that
+    # scheduling jitter doesn't skip every other run). Returns whether a refresh ran.
+    started = time.monotonic()
     async with AsyncSessionLocal() as session:
-        ticket_number = random.randint(1000, 9999)
-        participant = Participant(
-            giveaway_id=giveaway_id,
-            user_id=user_id,
-            username=username,
-            ticket_number=ticket_number,
-            joined_at=datetime.now(timezone.utc),
-            can_dm=True,
+        result = await session.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _STATS_REFRESH_LOCK}
         )
-        session.add(participant)
-        try:
+        if not result.scalar_one():
             await session.commit()
-        except IntegrityError:
-            await session.rollback()
             return False
-        return True
-
-
-async def get_participant(giveaway_id: int, user_id: int) -> Participant | None:
+        result = await session.execute(
+            text("SELECT extract(epoch FROM clock_timestamp() - refreshed_at) FROM global_stats_snapshot")
+        )
+        if result.scalar_one() < max_age:
+            await session.commit()
+            return False
+        await session.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY global_stats_snapshot"))
+        await session.commit()
+    logger.info("Global stats snapshot refreshed in %.2fs", time.monotonic() - started)
+    return True
+
+
+# add_participant outcomes.
+JOINED = "joined"
+ALREADY_JOINED = "already_joined"
+NOT_ACTIVE = "not_active"  # finished, paused or deleted
+
+
+async def add_participant(giveaway_id: int, user_id: int, username: str | None) -> tuple[str, int | None]:
+    # Returns (outcome, ticket number). The row is inserted only while the giveaway is still
+    # ACTIVE: FOR SHARE on the giveaway row serializes the join with the claiming UPDATE in
+    # _finalize, so a join either commits before the draw starts or sees the giveaway finished.
+    # Callers' status checks may be stale (cache, slow getChatMember); this one is not.
+    active = (
+        select(
+            Giveaway.id,
+            literal(user_id, BigInteger),
+            literal(username, String),
+            func.now(),
+            true(),
+        )
+        .where(Giveaway.id == giveaway_id, Giveaway.status == "ACTIVE")
+        .with_for_update(read=True)
+    )
     async with AsyncSessionLocal() as session:
         result = await session.execute(
-            select(Participant).where(Participant.giveaway_id == giveaway_id, Participant.user_id == user_id)
+            pg_insert(Participant)
+            .from_select(["giveaway_id", "user_id", "username", "joined_at", "can_dm"], active)
+            .on_conflict_do_nothing(constraint="uq_participants_giveaway_user")
+            .returning(Participant.ticket_number)
         )
-        return result.scalar_one_or_none()
+        ticket_number = result.scalar_one_or_none()
+        if ticket_number is not None:
+            await session.commit()
+            return JOINED, ticket_number
+        # Nothing inserted: tell "already joined" from "not active" (rare path, second query).
+        result = await session.execute(
+            select(Participant.ticket_number).where(
+                Participant.giveaway_id == giveaway_id, Participant.user_id == user_id
+            )
+        )
+        ticket_number = result.scalar_one_or_none()
+        await session.commit()
+    if ticket_number is not None:
+        return ALREADY_JOINED, ticket_number
+    _giveaways.invalidate(giveaway_id)
+    return NOT_ACTIVE, None
 
 
-async def participants_count(giveaway_id: int) -> int:
+async def giveaway_counts(giveaway_id: int) -> dict[str, int]:
     async with AsyncSessionLocal() as session:
         result = await session.execute(
-            select(func.count()).select_from(Participant).where(Participant.giveaway_id == giveaway_id)
+            select(
+                func.coalesce(func.sum(GiveawayCounter.participants), 0),
+                func.coalesce(func.sum(GiveawayCounter.winners), 0),
+                func.coalesce(func.sum(GiveawayCounter.broadcasts), 0),
+            ).where(GiveawayCounter.giveaway_id == giveaway_id)
         )
-        return int(result.scalar_one())
+        participants, winners, broadcasts = result.one()
+        return {"participants": int(participants), "winners": int(winners), "broadcasts": int(broadcasts)}
+
+
+async def participants_count(giveaway_id: int) -> int:
+    return (await giveaway_counts(giveaway_id))["participants"]
 
 
 async def winners_count(giveaway_id: int) -> int:
+    return (await giveaway_counts(giveaway_id))["winners"]
+
+
+async def reconcile_counters() -> int:
+    # Actual counts and counter sums are read by one statement, i.e. from one snapshot, and
+    # the difference is added (not assigned) to slot 0, so writes racing with the
+    # reconciliation keep their own increments. Returns the number of giveaways corrected.
     async with AsyncSessionLocal() as session:
         result = await session.execute(
-            select(func.count()).select_from(Winner).where(Winner.giveaway_id == giveaway_id)
+            text(
+                """
+                WITH actual AS (
+                    SELECT g.id AS giveaway_id,
+                        (SELECT count(*) FROM participants p WHERE p.giveaway_id = g.id) AS participants,
+                        (SELECT count(*) FROM winners w WHERE w.giveaway_id = g.id) AS winners,
+                        (SELECT count(*) FROM broadcasts b WHERE b.giveaway_id = g.id) AS broadcasts
+                    FROM giveaways g
+                ), counted AS (
+                    SELECT giveaway_id, sum(participants) AS participants, sum(winners) AS winners,
+                        sum(broadcasts) AS broadcasts
+                    FROM giveaway_counters
+                    GROUP BY giveaway_id
+                ), drift AS (
+                    SELECT a.giveaway_id,
+                        a.participants - coalesce(c.participants, 0) AS participants,
+                        a.winners - coalesce(c.winners, 0) AS winners,
+                        a.broadcasts - coalesce(c.broadcasts, 0) AS broadcasts
+                    FROM actual a LEFT JOIN counted c USING (giveaway_id)
+                )
+                INSERT INTO giveaway_counters AS c (giveaway_id, slot, participants, winners, broadcasts)
+                SELECT giveaway_id, 0, participants, winners, broadcasts
+                FROM drift
+                WHERE participants <> 0 OR winners <> 0 OR broadcasts <> 0
+                ON CONFLICT (giveaway_id, slot) DO UPDATE SET
+                    participants = c.participants + EXCLUDED.participants,
+                    winners = c.winners + EXCLUDED.winners,
+                    broadcasts = c.broadcasts + EXCLUDED.broadcasts
+                RETURNING giveaway_id
+                """
+            )
         )
-        return int(result.scalar_one())
-
-
-async def broadcasts_count(giveaway_id: int) -> int:
+        fixed = result.scalars().all()
+        await session.commit()
+    if fixed:
+        logger.warning("Counter drift corrected for giveaways %s", sorted(fixed))
+    return len(fixed)
+
+
+async def list_participants_page(
+    giveaway_id: int,
+    after_id: int | None = None,
+    before_id: int | None = None,
+    limit: int = 50,
+) -> tuple[list[tuple[int, int, str | None]], bool, bool]:
+    # Keyset page of (id, user_id, username) ordered by id, plus (has_prev, has_next).
+    # One extra row is fetched in the direction of travel to tell whether more exist.
+    query = select(Participant.id, Participant.user_id, Participant.username).where(
+        Participant.giveaway_id == giveaway_id
+    )
+    if before_id is not None:
+        query = query.where(Participant.id < before_id).order_by(Participant.id.desc())
+    else:
+        if after_id is not None:
+            query = query.where(Participant.id > after_id)
+        query = query.order_by(Participant.id.asc())
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(query.limit(limit + 1))
+        rows = [tuple(row) for row in result.all()]
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if before_id is not None:
+        rows.reverse()
+        return rows, more, True
+    return rows, after_id is not None, more
+
+
+async def iter_participants(giveaway_id: int, page_size: int = 1000, joined_until: datetime | None = None):
+    # Yields (user_id, username, ticket_number, joined_at), one short session per page.
+    # joined_until restricts the stream to the participants a draw at that time could see.
+    query = select(
+        Participant.id,
+        Participant.user_id,
+        Participant.username,
+        Participant.ticket_number,
+        Participant.joined_at,
+    ).where(Participant.giveaway_id == giveaway_id)
+    if joined_until is not None:
+        query = query.where(Participant.joined_at <= joined_until)
+    cursor = 0
+    while True:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                query.where(Participant.id > cursor).order_by(Participant.id.asc()).limit(page_size)
+            )
+            rows = result.all()
+        for _, user_id, username, ticket_number, joined_at in rows:
+            yield user_id, username, ticket_number, joined_at
+        if len(rows) < page_size:
+            return
+        cursor = rows[-1][0]
+
+
+def _draw_winners_query(giveaway: Giveaway, seed: str, drawn_at: datetime):
+    # Winners are drawn and inserted by PostgreSQL in one INSERT ... SELECT: only the
+    # top-k of the seeded ranking is kept (heap sort over the participants index scan),
+    # so no participant rows are hydrated in Python. Only participants that had joined by
+    # drawn_at take part, so rows landing after the draw cannot change its verifiable result.
+    draw = select(
+        Participant.giveaway_id, Participant.user_id, literal(drawn_at, DateTime(timezone=True))
+    ).where(Participant.giveaway_id == giveaway.id, Participant.joined_at <= drawn_at)
+    if giveaway.winners_mode != "ALL":
+        draw = draw.order_by(*rank_order(seed)).limit(giveaway.winners_count)
+    return (
+        insert(Winner)
+        .from_select(["giveaway_id", "user_id", "picked_at"], draw)
+        .returning(Winner.user_id)
+    )
+
+
+async def _stored_winners(session, giveaway_id: int) -> list[int]:
+    result = await session.execute(select(Winner.user_id).where(Winner.giveaway_id == giveaway_id))
+    return list(result.scalars().all())
+
+
+async def _finalize(giveaway_id: int, only_if_due: bool = False) -> tuple[list[int], bool]:
+    # The conditional UPDATE is the claim: concurrent finalizers block on the row lock and,
+    # once the first commits, re-check status and match nothing. Only the claimant draws,
+    # in the same transaction; everyone else reads the stored winners. Returns (winners, drawn).
+    # drawn_at is clock_timestamp() taken once the row lock is held, i.e. after every join that
+    # share-locked the giveaway first has committed (see add_participant).
+    # only_if_due (deadline path) also re-checks ends_at, so a deadline moved later or cleared
+    # after its timer fired does not draw early; manual finishes skip it.
+    claim = update(Giveaway).where(Giveaway.id == giveaway_id, Giveaway.status == "ACTIVE")
+    if only_if_due:
+        claim = claim.where(Giveaway.ends_at != None, Giveaway.ends_at <= func.clock_timestamp())
     async with AsyncSessionLocal() as session:
         result = await session.execute(
-            select(func.count()).select_from(Broadcast).where(Broadcast.giveaway_id == giveaway_id)
+            claim
+            .values(status="FINISHED", drawn_at=func.clock_timestamp())
+            .returning(
+                Giveaway.id, Giveaway.winners_mode, Giveaway.winners_count, Giveaway.draw_secret, Giveaway.drawn_at
+            )
         )
-        return int(result.scalar_one())
-
+        claimed = result.one_or_none()
+        if claimed is None:
+            winners_ids = await _stored_winners(session, giveaway_id)
+            await session.commit()
+            return winners_ids, False
+
+        draw_fields = {}
+        draw_secret = claimed.draw_secret
+        if not draw_secret:
+            # Giveaways created before draws were seeded have no prior commitment. A commitment
+            # made now would prove nothing, so draw_commitment stays NULL and says so.
+            draw_secret, _ = new_draw_secret()
+            draw_fields["draw_secret"] = draw_secret
+        seed = derive_seed(draw_secret, giveaway_id)
+
+        winners_ids: list[int] = []
+        if claimed.winners_mode == "ALL" or claimed.winners_count:
+            result = await session.execute(_draw_winners_query(claimed, seed, claimed.drawn_at))
+            winners_ids = list(result.scalars().all())
 
-async def list_participants(giveaway_id: int) -> Sequence[Participant]:
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(Participant).where(Participant.giveaway_id == giveaway_id))
-        return result.scalars().all()
+        await session.execute(
+            update(Giveaway)
+            .where(Giveaway.id == giveaway_id)
+            .values(draw_seed=seed, draw_algorithm=DRAW_ALGORITHM, **draw_fields)
+        )
+        await session.commit()
+    _giveaways.invalidate(giveaway_id)
+    return winners_ids, True
 
 
-def _pick_winners_ids(participants: Sequence[Participant], winners_mode: str, winners_count: int | None) -> list[int]:
-    user_ids = [p.user_id for p in participants]
-    if not user_ids:
-        return []
-    if winners_mode == "ALL":
-        return user_ids
-    if winners_count is None:
-        return []
-    k = min(winners_count, len(user_ids))
-    return random.sample(user_ids, k=k)
+async def finalize_giveaway(giveaway_id: int) -> list[int]:
+    winners_ids, _ = await _finalize(giveaway_id)
+    return winners_ids
 
 
-async def pick_winners(giveaway: Giveaway) -> list[int]:
-    participants = await list_participants(giveaway.id)
-    return _pick_winners_ids(participants, giveaway.winners_mode, giveaway.winners_count)
+def unnotified_winners_query(giveaway_id: int, limit: int):
+    return (
+        select(Winner.id)
+        .where(Winner.giveaway_id == giveaway_id, Winner.notified_at == None)
+        .order_by(Winner.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
 
 
-async def finalize_giveaway(giveaway_id: int) -> list[int]:
+async def _claim_unnotified_winners(giveaway_id: int, limit: int) -> list[tuple[int, int | None]]:
+    # Claiming stamps notified_at before sending: concurrent or resumed notifiers never pick the
+    # same winner twice. notify_winners releases claims it could not deliver, so only a hard
+    # crash of the process can lose the page in flight.
     async with AsyncSessionLocal() as session:
-        result = await session.execute(select(Giveaway).where(Giveaway.id == giveaway_id))
-        giveaway = result.scalar_one_or_none()
-        if not giveaway:
+        claimed = unnotified_winners_query(giveaway_id, limit)
+        result = await session.execute(
+            update(Winner)
+            .where(Winner.id.in_(claimed))
+            .values(notified_at=datetime.now(timezone.utc))
+            .returning(Winner.user_id)
+        )
+        user_ids = list(result.scalars().all())
+        if not user_ids:
+            await session.commit()
             return []
-        if giveaway.status == "FINISHED":
-            result = await session.execute(select(Winner.user_id).where(Winner.giveaway_id == giveaway_id))
-            return list(result.scalars().all())
-
-        result = await session.execute(select(Participant).where(Participant.giveaway_id == giveaway_id))
-        participants = result.scalars().all()
-
-        winners_ids = _pick_winners_ids(participants, giveaway.winners_mode, giveaway.winners_count)
-        now = datetime.now(timezone.utc)
-        for user_id in winners_ids:
-            session.add(Winner(giveaway_id=giveaway_id, user_id=user_id, picked_at=now))
-
-        giveaway.status = "FINISHED"
+        result = await session.execute(
+            select(Participant.user_id, Participant.ticket_number).where(
+                Participant.giveaway_id == giveaway_id, Participant.user_id.in_(user_ids)
+            )
+        )
+        tickets = dict(result.all())
         await session.commit()
-        return winners_ids
+    return [(user_id, tickets.get(user_id)) for user_id in user_ids]
 
 
-async def finalize_and_notify(bot: Bot, giveaway_id: int) -> tuple[list[int], int, int]:
-    winners_ids = await finalize_giveaway(giveaway_id)
-    if not winners_ids:
-        return winners_ids, 0, 0
+async def _release_winner_claims(giveaway_id: int, user_ids: list[int]) -> None:
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(Winner)
+            .where(Winner.giveaway_id == giveaway_id, Winner.user_id.in_(user_ids))
+            .values(notified_at=None)
+        )
+        await session.commit()
 
-    giveaway = await get_giveaway(giveaway_id)
-    if not giveaway:
-        return winners_ids, 0, 0
 
+async def notify_winners(
+    bot: Bot,
+    giveaway: Giveaway,
+    concurrency: int = 8,
+    page_size: int = 50,
+    on_progress: Callable[[int, int], Awaitable[None]] | None = None,
+    progress_interval: float = 5.0,
+) -> tuple[int, int]:
     base_text = giveaway.winner_message or "Поздравляем! Вы победитель розыгрыша."
     ok = 0
     fail = 0
-    for user_id in winners_ids:
-        participant = await get_participant(giveaway_id, user_id)
-        ticket = participant.ticket_number if participant else "—"
+    last_report = time.monotonic()
+    # Claimed winners whose message has not gone out: still in flight, or deferred by a flood
+    # limit / transport error. Their claims are released when the run ends, however it ends,
+    # so the next run (finalize_and_notify with resume=True) retries exactly these winners.
+    unsent: set[int] = set()
+
+    async def winners():
+        while True:
+            page = await _claim_unnotified_winners(giveaway.id, page_size)
+            unsent.update(user_id for user_id, _ in page)
+            for item in page:
+                yield item
+            if len(page) < page_size:
+                return
+
+    async def send(item: tuple[int, int | None]) -> None:
+        nonlocal ok, fail, last_report
+        user_id, ticket = item
         message_text = (
             "🏆 <b>Поздравляем! Вы выиграли!</b>\n"
-            f"🎫 <b>Номер вашего билета:</b> #{ticket}\n\n"
+            f"🎫 <b>Номер вашего билета:</b> #{ticket if ticket is not None else '—'}\n\n"
             f"{base_text}"
         )
-        reply_markup = contact_button_markup(message_text)
-        try:
-            await send_message_limited(bot, user_id, message_text, reply_markup=reply_markup, user_id=user_id)
+        result = await deliver(bot, user_id, message_text, reply_markup=contact_button_markup(message_text))
+        # A deferred winner stays in `unsent` and is counted only as pending, not as a failure.
+        if result != DEFERRED:
+            unsent.discard(user_id)
+        if result == DELIVERED:
             ok += 1
-        except TelegramRetryAfter as e:
-            await asyncio.sleep(float(e.retry_after))
-            try:
-                await send_message_limited(bot, user_id, message_text, reply_markup=reply_markup, user_id=user_id)
-                ok += 1
-            except (TelegramForbiddenError, TelegramBadRequest):
-                fail += 1
-                await _mark_cant_dm_by_user(giveaway_id, user_id)
-        except (TelegramForbiddenError, TelegramBadRequest):
+        elif result == UNREACHABLE:
             fail += 1
-            await _mark_cant_dm_by_user(giveaway_id, user_id)
-            await mark_user_cant_dm(user_id)
-        except Exception:
-            fail += 1
-        await asyncio.sleep(0.12)
-    return winners_ids, ok, fail
+        if on_progress and time.monotonic() - last_report >= progress_interval:
+            last_report = time.monotonic()
+            await on_progress(ok, fail)
 
+    try:
+        await run_lanes(winners(), send, concurrency)
+    finally:
+        if unsent:
+            logger.warning("Giveaway %s: %s winner(s) left to notify on the next run", giveaway.id, len(unsent))
+            await _release_winner_claims(giveaway.id, list(unsent))
+    logger.info("Giveaway %s: winners notified OK %s / FAIL %s", giveaway.id, ok, fail)
+    if unsent:
+        raise WinnersPending(giveaway.id, ok, fail, len(unsent))
+    return ok, fail
+
+
+async def finalize_and_notify(
+    bot: Bot,
+    giveaway_id: int,
+    on_progress: Callable[[int, int], Awaitable[None]] | None = None,
+    resume: bool = False,
+    only_if_due: bool = False,
+) -> tuple[list[int], int, int]:
+    # Only the caller that drew notifies. With resume=True (admin actions) an already finished
+    # giveaway is notified too, which picks up an interrupted run: only unclaimed winners are messaged.
+    winners_ids, drawn = await _finalize(giveaway_id, only_if_due=only_if_due)
+    if not winners_ids or not (drawn or resume):
+        return winners_ids, 0, 0
 
-async def mark_giveaway_finished_if_expired(bot: Bot) -> list[int]:
-    now = datetime.now(timezone.utc)
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(Giveaway).where(Giveaway.status == "ACTIVE", Giveaway.ends_at != None, Giveaway.ends_at <= now)
-        )
-        giveaways = result.scalars().all()
-    finished_ids: list[int] = []
-    for giveaway in giveaways:
-        winners, _, _ = await finalize_and_notify(bot, giveaway.id)
-        if winners is not None:
-            finished_ids.append(giveaway.id)
-    return finished_ids
+    giveaway = await get_giveaway(giveaway_id)
+    if not giveaway:
+        return winners_ids, 0, 0
+
+    ok, fail = await notify_winners(bot, giveaway, on_progress=on_progress)
+    return winners_ids, ok, fail
 
 
 async def create_giveaway(
@@ -239,6 +526,7 @@ async def create_giveaway(
     created_by: int,
 ) -> Giveaway:
     async with AsyncSessionLocal() as session:
+        draw_secret, draw_commitment = new_draw_secret()
         giveaway = Giveaway(
             title=title,
             description=description,
@@ -250,36 +538,32 @@ async def create_giveaway(
             status="ACTIVE",
             created_by=created_by,
             created_at=datetime.now(timezone.utc),
+            draw_secret=draw_secret,
+            draw_commitment=draw_commitment,
         )
         session.add(giveaway)
         await session.commit()
         await session.refresh(giveaway)
-        return giveaway
+    _giveaways.invalidate(giveaway.id)
+    return giveaway
 
 
 async def set_giveaway_status(giveaway_id: int, status: str) -> None:
     async with AsyncSessionLocal() as session:
         await session.execute(update(Giveaway).where(Giveaway.id == giveaway_id).values(status=status))
         await session.commit()
+    _giveaways.invalidate(giveaway_id)
 
 
 async def update_giveaway_fields(giveaway_id: int, **fields) -> None:
     async with AsyncSessionLocal() as session:
         await session.execute(update(Giveaway).where(Giveaway.id == giveaway_id).values(**fields))
         await session.commit()
+    _giveaways.invalidate(giveaway_id)
 
 
 async def delete_giveaway(giveaway_id: int) -> None:
     async with AsyncSessionLocal() as session:
         await session.execute(delete(Giveaway).where(Giveaway.id == giveaway_id))
         await session.commit()
-
-
-async def _mark_cant_dm_by_user(giveaway_id: int, user_id: int) -> None:
-    async with AsyncSessionLocal() as session:
-        await session.execute(
-            update(Participant)
-            .where(Participant.giveaway_id == giveaway_id, Participant.user_id == user_id)
-            .values(can_dm=False)
-        )
-        await session.commit()
+    _giveaways.invalidate(giveaway_id)
@@ -1,13 +1,33 @@
 import logging
-import asyncio
 from aiogram import Bot
 from aiogram.exceptions import TelegramRetryAfter
 from aiogram.types import InlineKeyboardMarkup
-from app.utils.ratelimiter import RateLimiter, RateLimits
+from app.config.config import settings
+from app.utils.ratelimiter import RateLimiter, RateLimits, PRIORITY_INTERACTIVE
 
 logger = logging.getLogger(__name__)
 
-_limits = RateLimiter(RateLimits())
+
+def _build_limiter() -> RateLimiter:
+    if settings.rate_limit_backend == "postgres":
+        from app.services.shared_ratelimit import PostgresBucket
+
+        return RateLimiter(RateLimits(), backend=PostgresBucket())
+    return RateLimiter(RateLimits())
+
+
+_limits = _build_limiter()
+
+
+def current_send_rate() -> float:
+    return _limits.effective_rate
+
+
+async def _throttle(e: TelegramRetryAfter, chat_id: int | str, chat_key: int, user_id: int | None) -> None:
+    # A 429 on a private chat means the bot as a whole is flooding, so every sender backs off.
+    # Channel/group posts (no user_id) only pause the affected chat.
+    logger.warning("RetryAfter %s sec for chat %s", e.retry_after, chat_id)
+    await _limits.throttle(float(e.retry_after), chat_id=chat_key if user_id is None else None)
 
 
 async def send_message_limited(
@@ -16,19 +36,23 @@ async def send_message_limited(
     text: str,
     reply_markup: InlineKeyboardMarkup | None = None,
     user_id: int | None = None,
+    priority: int = PRIORITY_INTERACTIVE,
 ) -> None:
     if isinstance(chat_id, str):
         chat_key = hash(chat_id)
     else:
         chat_key = int(chat_id)
-    await _limits.acquire(chat_id=chat_key, user_id=user_id)
+    await _limits.acquire(chat_id=chat_key, user_id=user_id, priority=priority)
     try:
         await bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
     except TelegramRetryAfter as e:
-        logger.warning("RetryAfter %s sec for chat %s", e.retry_after, chat_id)
-        await asyncio.sleep(float(e.retry_after))
-        await _limits.acquire(chat_id=chat_key, user_id=user_id)
-        await bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
+        await _throttle(e, chat_id, chat_key, user_id)
+        await _limits.acquire(chat_id=chat_key, user_id=user_id, priority=priority)
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
+        except TelegramRetryAfter as e:
+            await _throttle(e, chat_id, chat_key, user_id)
+            raise
 
 
 async def send_photo_limited(
@@ -46,7 +70,10 @@ async def send_photo_limited(
     try:
         await bot.send_photo(chat_id=chat_id, photo=photo, caption=caption, reply_markup=reply_markup)
     except TelegramRetryAfter as e:
-        logger.warning("RetryAfter %s sec for chat %s", e.retry_after, chat_id)
-        await asyncio.sleep(float(e.retry_after))
+        await _throttle(e, chat_id, chat_key, None)
         await _limits.acquire(chat_id=chat_key, user_id=None)
-        await bot.send_photo(chat_id=chat_id, photo=photo, caption=caption, reply_markup=reply_markup)
+        try:
+            await bot.send_photo(chat_id=chat_id, photo=photo, caption=caption, reply_markup=reply_markup)
+        except TelegramRetryAfter as e:
+            await _throttle(e, chat_id, chat_key, None)
+            raise
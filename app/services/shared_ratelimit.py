@@ -0,0 +1,46 @@
+from sqlalchemy import text
+
+from app.db.session import AsyncSessionLocal
+
+# GCRA on a single row: the row lock serializes every process that shares the bucket,
+# and the database clock is the only clock involved, so replicas need not be in sync.
+_RESERVE = text(
+    """
+    UPDATE rate_limit_buckets
+    SET tat = GREATEST(tat, extract(epoch FROM clock_timestamp())) + :interval
+    WHERE name = :name
+    RETURNING tat - :interval - :tolerance - extract(epoch FROM clock_timestamp())
+    """
+)
+
+_PAUSE = text(
+    """
+    UPDATE rate_limit_buckets
+    SET tat = GREATEST(tat, extract(epoch FROM clock_timestamp()) + :seconds + :tolerance)
+    WHERE name = :name
+    """
+)
+
+_CREATE = text("INSERT INTO rate_limit_buckets (name, tat) VALUES (:name, 0) ON CONFLICT (name) DO NOTHING")
+
+
+class PostgresBucket:
+    def __init__(self, name: str = "telegram_global") -> None:
+        self.name = name
+
+    async def reserve(self, interval: float, tolerance: float) -> float:
+        params = {"name": self.name, "interval": interval, "tolerance": tolerance}
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(_RESERVE, params)
+            wait = result.scalar_one_or_none()
+            if wait is None:
+                await session.execute(_CREATE, {"name": self.name})
+                result = await session.execute(_RESERVE, params)
+                wait = result.scalar_one()
+            await session.commit()
+        return float(wait)
+
+    async def pause(self, seconds: float, tolerance: float) -> None:
+        async with AsyncSessionLocal() as session:
+            await session.execute(_PAUSE, {"name": self.name, "seconds": seconds, "tolerance": tolerance})
+            await session.commit()
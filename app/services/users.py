@@ -1,10 +1,16 @@
+import asyncio
+import logging
 from datetime import datetime, timezone
-from sqlalchemy import select, update
+from sqlalchemy import select, update, any_, bindparam, BigInteger
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import IntegrityError
 
 from app.db.session import AsyncSessionLocal
+from app.models.participant import Participant
 from app.models.user import User
 
+logger = logging.getLogger(__name__)
+
 
 async def upsert_user(user_id: int, username: str | None) -> None:
     async with AsyncSessionLocal() as session:
@@ -28,7 +34,55 @@ async def upsert_user(user_id: int, username: str | None) -> None:
             await session.rollback()
 
 
-async def mark_user_cant_dm(user_id: int) -> None:
+async def mark_users_cant_dm(user_ids: list[int]) -> None:
+    ids = bindparam("ids", user_ids, type_=ARRAY(BigInteger))
     async with AsyncSessionLocal() as session:
-        await session.execute(update(User).where(User.user_id == user_id).values(can_dm=False))
+        await session.execute(update(User).where(User.user_id == any_(ids)).values(can_dm=False))
+        await session.execute(update(Participant).where(Participant.user_id == any_(ids)).values(can_dm=False))
         await session.commit()
+
+
+class CantDmBuffer:
+    # Collects users that blocked the bot so the send path never waits on the DB;
+    # they are written with one set-based UPDATE per table on every flush.
+    def __init__(self, max_batch: int = 500, flush_interval: float = 2.0) -> None:
+        self._max_batch = max_batch
+        self._flush_interval = flush_interval
+        self._pending: set[int] = set()
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def add(self, user_id: int) -> None:
+        self._pending.add(user_id)
+        if len(self._pending) >= self._max_batch:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._pending:
+                return
+            batch = list(self._pending)
+            self._pending.clear()
+            try:
+                await mark_users_cant_dm(batch)
+            except Exception:
+                self._pending.update(batch)
+                raise
+
+    async def run(self) -> None:
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self._flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                try:
+                    await self.flush()
+                except Exception:
+                    logger.exception("Failed to flush %s can_dm invalidation(s)", len(self._pending))
+        finally:
+            await self.flush()
+
+
+cant_dm_buffer = CantDmBuffer()
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import sys
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from app.db.session import engine
+from app.services.broadcast_jobs import claimable_jobs_query, giveaway_targets_query, global_targets_query
+from app.services.giveaways import pending_deadlines_query, unnotified_winners_query
+
+# Copies the hot tables and their indexes into a scratch schema, seeds a synthetic dataset,
+# vacuums it so index-only scans are costed as they are in production, runs EXPLAIN on the
+# service queries and checks that each plan scans the index built for it. The scratch schema
+# is dropped afterwards. Run against a migrated development database:
+#   python -m app.utils.explain_check
+
+_SCHEMA = "explain_check"
+_TABLES = ("giveaways", "users", "participants", "winners", "broadcast_jobs")
+_GIVEAWAY_ID = 50
+
+_SEED = (
+    """
+    INSERT INTO giveaways
+        (id, title, channel_username, winners_mode, winners_count, ends_at, status, created_by, created_at)
+    SELECT g, 'explain check', '@explain_check', 'COUNT', 10, now() + g * interval '1 minute',
+        CASE WHEN g % 50 = 0 THEN 'ACTIVE' ELSE 'FINISHED' END, 0, now()
+    FROM generate_series(1, 5000) g
+    """,
+    """
+    INSERT INTO users (id, user_id, started_at, can_dm)
+    SELECT g, 9000000000000 + g, now(), g % 10 <> 0 FROM generate_series(1, 100000) g
+    """,
+    """
+    INSERT INTO participants (id, giveaway_id, user_id, ticket_number, joined_at, can_dm)
+    SELECT (gw - 1) * 5000 + u, gw * 10, 9000000000000 + u, u, now(), u % 10 <> 0
+    FROM generate_series(1, 20) gw, generate_series(1, 5000) u
+    """,
+    """
+    INSERT INTO winners (id, giveaway_id, user_id, picked_at, notified_at)
+    SELECT (gw - 1) * 2000 + u, gw * 10, 9000000000000 + u, now(), CASE WHEN u % 100 = 0 THEN NULL ELSE now() END
+    FROM generate_series(1, 20) gw, generate_series(1, 2000) u
+    """,
+    """
+    INSERT INTO broadcast_jobs (id, text, is_global, sent_ok, sent_fail, status, created_at, updated_at)
+    SELECT g, 'explain check', false, 0, 0, CASE WHEN g % 5000 = 0 THEN 'PENDING' ELSE 'DONE' END, now(), now()
+    FROM generate_series(1, 20000) g
+    """,
+)
+
+
+def _index_names(plan: dict) -> set[str]:
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= _index_names(child)
+    return names
+
+
+async def _explain(conn, stmt) -> dict:
+    # render_postcompile expands IN (...) lists into ordinary positional parameters.
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup or ())
+    result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params)
+    plan = result.scalar_one()
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+
+async def _build_scratch(conn) -> None:
+    schema = (await conn.execute(text("SELECT current_schema()"))).scalar_one()
+    result = await conn.execute(
+        text("SELECT indexdef FROM pg_indexes WHERE schemaname = :schema AND tablename = ANY(:tables)"),
+        {"schema": schema, "tables": list(_TABLES)},
+    )
+    indexes = result.scalars().all()
+    await conn.execute(text(f"CREATE SCHEMA {_SCHEMA}"))
+    for table in _TABLES:
+        await conn.execute(text(f"CREATE TABLE {_SCHEMA}.{table} (LIKE {schema}.{table})"))
+    await conn.execute(text(f"SET search_path TO {_SCHEMA}"))
+    for statement in _SEED:
+        await conn.execute(text(statement))
+    # Index names are only unique per schema, so the copies keep the names the plans are checked for.
+    for indexdef in indexes:
+        await conn.exec_driver_sql(indexdef.replace(f" ON {schema}.", f" ON {_SCHEMA}.", 1))
+    await conn.execute(text(f"VACUUM ANALYZE {', '.join(_TABLES)}"))
+
+
+async def _run() -> bool:
+    async with engine.connect() as conn:
+        # VACUUM cannot run inside a transaction block.
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            await _build_scratch(conn)
+            checks = (
+                ("pending deadlines", pending_deadlines_query(), "ix_giveaways_active_ends_at"),
+                ("global broadcast page", global_targets_query(None, 1000), "ix_users_can_dm_user_id"),
+                (
+                    "global broadcast page (cursor)",
+                    global_targets_query(9000000050000, 1000),
+                    "ix_users_can_dm_user_id",
+                ),
+                (
+                    "giveaway broadcast page",
+                    giveaway_targets_query(_GIVEAWAY_ID, None, 1000),
+                    "ix_participants_giveaway_can_dm_id",
+                ),
+                (
+                    "giveaway broadcast page (cursor)",
+                    giveaway_targets_query(_GIVEAWAY_ID, 22500, 1000),
+                    "ix_participants_giveaway_can_dm_id",
+                ),
+                ("broadcast job claim", claimable_jobs_query(datetime.now(timezone.utc)), "ix_broadcast_jobs_open_id"),
+                ("winner claim", unnotified_winners_query(_GIVEAWAY_ID, 50), "ix_winners_giveaway_unnotified_id"),
+            )
+            ok = True
+            for name, stmt, index in checks:
+                plan = await _explain(conn, stmt)
+                used = _index_names(plan)
+                passed = index in used
+                ok = ok and passed
+                status = "OK  " if passed else "FAIL"
+                print(f"{status} {name}: expected {index}, plan uses {sorted(used) or 'no index'}")
+                if not passed:
+                    print(json.dumps(plan, indent=2))
+            return ok
+        finally:
+            await conn.execute(text("RESET search_path"))
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {_SCHEMA} CASCADE"))
+
+
+async def _main() -> bool:
+    try:
+        return await _run()
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    if not asyncio.run(_main()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import asyncio
+import sys
+
+from app.services.giveaways import (
+    add_participant,
+    create_giveaway,
+    delete_giveaway,
+    finalize_giveaway,
+    winners_count,
+)
+
+
+# Fires N simultaneous finalizations at a throwaway giveaway and checks that exactly one
+# winner set was drawn and every caller got it back. Run against a development database:
+#   python -m app.utils.finalize_race [callers]
+async def _run(callers: int, participants: int = 200, winners: int = 10) -> bool:
+    giveaway = await create_giveaway(
+        title="finalize race check",
+        description=None,
+        channel_username="@finalize_race",
+        winner_message=None,
+        winners_mode="COUNT",
+        winners_count=winners,
+        ends_at=None,
+        created_by=0,
+    )
+    try:
+        for user_id in range(1, participants + 1):
+            await add_participant(giveaway.id, user_id, None)
+        results = await asyncio.gather(*[finalize_giveaway(giveaway.id) for _ in range(callers)])
+        drawn = await winners_count(giveaway.id)
+        distinct = {tuple(sorted(r)) for r in results}
+        print(f"{callers} callers, {len(distinct)} distinct result(s), {drawn} winner rows stored")
+        return len(distinct) == 1 and drawn == winners and len(results[0]) == winners
+    finally:
+        await delete_giveaway(giveaway.id)
+
+
+def main() -> None:
+    callers = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    ok = asyncio.run(_run(callers))
+    print("OK" if ok else "FAILED")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
 import asyncio
+import heapq
+import itertools
 import logging
 import time
-from collections import deque
 from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
 
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
 
 @dataclass
 class RateLimits:
@@ -14,60 +18,182 @@ class RateLimits:
     per_chat_per_min: int = 20
 
 
+class _Gcra:
+    # Generic cell rate algorithm: a bucket is a single "theoretical arrival time" (TAT)
+    # float. `limit` sends are allowed as a burst, then one per `period / limit` seconds.
+    __slots__ = ("interval", "tolerance")
+
+    def __init__(self, limit: float, period: float) -> None:
+        self.interval = period / limit
+        self.tolerance = period - self.interval
+
+    def wait(self, tat: float, now: float) -> float:
+        return tat - self.tolerance - now
+
+    def advance(self, tat: float, now: float) -> float:
+        return max(tat, now) + self.interval
+
+
+class MemoryBucket:
+    # Default global bucket backend: the budget is owned by this process alone.
+    def __init__(self) -> None:
+        self._tat = 0.0
+
+    async def reserve(self, interval: float, tolerance: float) -> float:
+        now = time.monotonic()
+        wait = self._tat - tolerance - now
+        self._tat = max(self._tat, now) + interval
+        return wait
+
+    async def pause(self, seconds: float, tolerance: float) -> None:
+        self._tat = max(self._tat, time.monotonic() + seconds + tolerance)
+
+
 class RateLimiter:
-    def __init__(self, limits: RateLimits) -> None:
+    # The global budget lives in a pluggable bucket backend: anything with async
+    # `reserve(interval, tolerance) -> wait` and `pause(seconds, tolerance)` will do.
+    # Per-user and per-chat limits are always tracked in-process.
+    def __init__(
+        self,
+        limits: RateLimits,
+        backend=None,
+        sweep_threshold: int = 1024,
+        min_rate: float = 1.0,
+        decrease_factor: float = 0.5,
+        increase_step: float = 1.0,
+        probe_interval: float = 5.0,
+    ) -> None:
         self.limits = limits
-        self._global_times = deque()
-        self._per_user_times: dict[int, deque] = {}
-        self._per_chat_times: dict[int, deque] = {}
-        self._lock = asyncio.Lock()
+        self._backend = backend or MemoryBucket()
+        self._fallback = MemoryBucket()
+        self._rate = float(limits.global_per_sec)
+        self._min_rate = min_rate
+        self._decrease_factor = decrease_factor
+        self._increase_step = increase_step
+        self._probe_interval = probe_interval
+        self._last_adjust = time.monotonic()
+        self._pause_until = 0.0
+        self._global = _Gcra(self._rate, 1.0)
+        self._per_user = _Gcra(limits.per_user_per_sec, 1.0)
+        self._per_chat = _Gcra(limits.per_chat_per_min, 60.0)
+        self._user_tats: dict[int, float] = {}
+        self._chat_tats: dict[int, float] = {}
+        self._min_sweep_threshold = sweep_threshold
+        self._sweep_threshold = sweep_threshold
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
         self._sent_count = 0
         self._last_report = time.monotonic()
 
-    async def acquire(self, chat_id: int, user_id: int | None = None) -> None:
-        while True:
-            async with self._lock:
-                now = time.monotonic()
-                self._cleanup(now)
-
-                if len(self._global_times) >= self.limits.global_per_sec:
-                    wait = 1 - (now - self._global_times[0])
-                    logger.debug("Global rate limit hit, wait %.3fs", wait)
-                elif user_id is not None and len(self._per_user_times.get(user_id, deque())) >= self.limits.per_user_per_sec:
-                    wait = 1 - (now - self._per_user_times[user_id][0])
-                    logger.debug("User rate limit hit for %s, wait %.3fs", user_id, wait)
-                elif len(self._per_chat_times.get(chat_id, deque())) >= self.limits.per_chat_per_min:
-                    wait = 60 - (now - self._per_chat_times[chat_id][0])
-                    logger.debug("Chat rate limit hit for %s, wait %.3fs", chat_id, wait)
-                else:
-                    self._mark(now, chat_id, user_id)
-                    return
-
-            if wait < 0:
-                wait = 0.05
+    @property
+    def effective_rate(self) -> float:
+        return self._rate
+
+    async def throttle(self, retry_after: float, chat_id: int | None = None) -> None:
+        # Called on TelegramRetryAfter. A chat-scoped 429 only pauses that chat's bucket;
+        # otherwise the global bucket is paused and its rate cut multiplicatively (AIMD).
+        now = time.monotonic()
+        if chat_id is not None:
+            self._chat_tats[chat_id] = max(
+                self._chat_tats.get(chat_id, 0.0), now + retry_after + self._per_chat.tolerance
+            )
+            logger.warning("Chat %s throttled by Telegram for %.1fs", chat_id, retry_after)
+            return
+        if now < self._pause_until:
+            # Lanes already in flight when the flood started report it too; one flood event
+            # gets one multiplicative cut, later 429s inside its pause window only extend it.
+            logger.warning("Throttled by Telegram for %.1fs, rate stays at %.1f msg/sec", retry_after, self._rate)
+        else:
+            self._rate = max(self._min_rate, self._rate * self._decrease_factor)
+            self._global = _Gcra(self._rate, 1.0)
+            logger.warning(
+                "Throttled by Telegram for %.1fs, global rate lowered to %.1f msg/sec", retry_after, self._rate
+            )
+        self._last_adjust = now
+        self._pause_until = max(self._pause_until, now + retry_after)
+        try:
+            await self._backend.pause(retry_after, self._global.tolerance)
+        except Exception:
+            logger.exception("Failed to pause shared rate limit bucket")
+        await self._fallback.pause(retry_after, self._global.tolerance)
+
+    async def acquire(self, chat_id: int, user_id: int | None = None, priority: int = PRIORITY_INTERACTIVE) -> None:
+        # Per-user and per-chat slots are reserved up front, so a caller throttled on its own
+        # key sleeps exactly once and never holds up anybody else in the global queue.
+        wait = self._reserve_keys(time.monotonic(), chat_id, user_id)
+        if wait > 0:
+            logger.debug("Chat/user rate limit hit for %s, wait %.3fs", chat_id, wait)
             await asyncio.sleep(wait)
 
-    def _mark(self, now: float, chat_id: int, user_id: int | None) -> None:
-        self._global_times.append(now)
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await waiter
+
+    async def _dispatch(self) -> None:
+        # Reserves one global slot at a time, sleeps until it opens and then hands it to the
+        # head of the queue: lowest priority class first, FIFO within a class. Picking the
+        # waiter only after the sleep lets interactive traffic jump ahead of queued bulk sends,
+        # and each waiter is woken exactly once.
+        try:
+            while self._waiters:
+                wait = await self._reserve_global()
+                if wait > 0:
+                    logger.debug("Global rate limit hit, %s waiting, wait %.3fs", len(self._waiters), wait)
+                    await asyncio.sleep(wait)
+                while self._waiters:
+                    _, _, waiter = heapq.heappop(self._waiters)
+                    if not waiter.done():
+                        waiter.set_result(None)
+                        self._grant(time.monotonic())
+                        break
+        finally:
+            self._dispatcher = None
+
+    async def _reserve_global(self) -> float:
+        try:
+            return await self._backend.reserve(self._global.interval, self._global.tolerance)
+        except Exception:
+            # Keep sending on the process-local budget rather than stalling every waiter.
+            logger.exception("Shared rate limit backend failed, using local budget")
+            return await self._fallback.reserve(self._global.interval, self._global.tolerance)
+
+    def _reserve_keys(self, now: float, chat_id: int, user_id: int | None) -> float:
+        user_tat = self._user_tats.get(user_id, 0.0) if user_id is not None else 0.0
+        chat_tat = self._chat_tats.get(chat_id, 0.0)
+        wait = self._per_chat.wait(chat_tat, now)
         if user_id is not None:
-            self._per_user_times.setdefault(user_id, deque()).append(now)
-        self._per_chat_times.setdefault(chat_id, deque()).append(now)
+            wait = max(wait, self._per_user.wait(user_tat, now))
+        at = now + max(wait, 0.0)
+        if user_id is not None:
+            self._user_tats[user_id] = self._per_user.advance(user_tat, at)
+        self._chat_tats[chat_id] = self._per_chat.advance(chat_tat, at)
+        if len(self._user_tats) + len(self._chat_tats) > self._sweep_threshold:
+            self._expire_idle(now)
+        return wait
+
+    def _grant(self, now: float) -> None:
+        if self._rate < self.limits.global_per_sec and now - self._last_adjust >= self._probe_interval:
+            self._rate = min(float(self.limits.global_per_sec), self._rate + self._increase_step)
+            self._global = _Gcra(self._rate, 1.0)
+            self._last_adjust = now
         self._sent_count += 1
         self._report_if_needed(now)
 
-    def _cleanup(self, now: float) -> None:
-        while self._global_times and now - self._global_times[0] >= 1:
-            self._global_times.popleft()
-        for dq in list(self._per_user_times.values()):
-            while dq and now - dq[0] >= 1:
-                dq.popleft()
-        for dq in list(self._per_chat_times.values()):
-            while dq and now - dq[0] >= 60:
-                dq.popleft()
+    def _expire_idle(self, now: float) -> None:
+        # A key whose TAT is in the past behaves exactly like a missing key, so it can be dropped.
+        # The threshold doubles with the live key count, which keeps the sweep amortized O(1).
+        for tats in (self._user_tats, self._chat_tats):
+            for key in [key for key, tat in tats.items() if tat <= now]:
+                del tats[key]
+        live = len(self._user_tats) + len(self._chat_tats)
+        self._sweep_threshold = max(self._min_sweep_threshold, live * 2)
 
     def _report_if_needed(self, now: float) -> None:
         if now - self._last_report >= 60:
             rate = self._sent_count / (now - self._last_report)
-            logger.info("Average send rate: %.2f msg/sec", rate)
+            logger.info("Average send rate: %.2f msg/sec, effective limit %.1f msg/sec", rate, self._rate)
             self._sent_count = 0
             self._last_report = now
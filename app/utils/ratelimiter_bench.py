@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+from app.utils.ratelimiter import RateLimiter, RateLimits
+
+# Limits high enough that acquire never sleeps, so only the bookkeeping cost is measured.
+_LIMITS = RateLimits(global_per_sec=10**9, per_user_per_sec=1, per_chat_per_min=10**9)
+
+
+async def _bench(known_keys: int, samples: int) -> float:
+    limiter = RateLimiter(_LIMITS)
+    for key in range(known_keys):
+        await limiter.acquire(chat_id=key, user_id=key)
+    started = time.perf_counter()
+    for key in range(known_keys, known_keys + samples):
+        await limiter.acquire(chat_id=key, user_id=key)
+    return (time.perf_counter() - started) / samples
+
+
+async def _run(samples: int = 20000) -> None:
+    for known_keys in (1_000, 10_000, 100_000, 1_000_000):
+        per_call = await _bench(known_keys, samples)
+        print(f"{known_keys:>9} keys: {per_call * 1e6:7.2f} us/acquire")
+
+
+def main() -> None:
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
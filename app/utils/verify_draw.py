@@ -0,0 +1,79 @@
+import asyncio
+import heapq
+import sys
+
+from sqlalchemy import select
+
+from app.db.session import AsyncSessionLocal
+from app.models.giveaway import Giveaway
+from app.models.winner import Winner
+from app.services.draws import DRAW_ALGORITHM, commitment_matches, derive_seed, rank_key
+from app.services.giveaways import iter_participants
+
+
+async def _verify(giveaway_id: int) -> bool:
+    # Re-derives the draw in Python, independently of the SQL that performed it.
+    async with AsyncSessionLocal() as session:
+        giveaway = await session.get(Giveaway, giveaway_id)
+        if not giveaway:
+            print(f"Giveaway {giveaway_id} not found")
+            return False
+        result = await session.execute(select(Winner.user_id).where(Winner.giveaway_id == giveaway_id))
+        stored = set(result.scalars().all())
+
+    if giveaway.status != "FINISHED" or not giveaway.draw_seed:
+        print(f"Giveaway {giveaway_id} has not been drawn yet")
+        return False
+    if giveaway.draw_algorithm != DRAW_ALGORITHM:
+        print(f"Unsupported draw algorithm {giveaway.draw_algorithm!r}")
+        return False
+    ok = True
+    if not giveaway.draw_commitment:
+        # Created before draws were seeded: the result is reproducible, but nothing proves the
+        # secret was fixed before the draw.
+        print("No commitment was published before the draw: only reproducibility is checked")
+    elif not commitment_matches(giveaway.draw_secret, giveaway.draw_commitment):
+        print("Secret does not match the published commitment")
+        ok = False
+    seed = derive_seed(giveaway.draw_secret, giveaway.id)
+    if seed != giveaway.draw_seed:
+        print("Stored seed does not match the one derived from the secret")
+        ok = False
+
+    # Draws recorded before drawn_at existed (NULL) took every participant.
+    user_ids = [
+        user_id
+        async for user_id, *_ in iter_participants(giveaway.id, page_size=10000, joined_until=giveaway.drawn_at)
+    ]
+    if giveaway.winners_mode == "ALL":
+        expected = set(user_ids)
+    else:
+        k = giveaway.winners_count or 0
+        expected = set(heapq.nsmallest(k, user_ids, key=lambda u: (rank_key(seed, u), u)))
+
+    print(f"Seed:      {seed}")
+    print(f"Algorithm: {giveaway.draw_algorithm}")
+    print(f"Drawn at:  {giveaway.drawn_at.isoformat() if giveaway.drawn_at else '—'}, {len(user_ids)} participant(s)")
+    print(f"Expected:  {len(expected)} winner(s), stored: {len(stored)}")
+    if expected != stored:
+        print(f"MISMATCH: missing {sorted(expected - stored)[:20]}, unexpected {sorted(stored - expected)[:20]}")
+        ok = False
+    if not ok:
+        print("FAILED")
+    elif not giveaway.draw_commitment:
+        print("OK (reproducible; no prior commitment)")
+    else:
+        print("OK")
+    return ok
+
+
+def main() -> None:
+    if len(sys.argv) != 2 or not sys.argv[1].isdigit():
+        print("Usage: python -m app.utils.verify_draw <giveaway_id>")
+        sys.exit(2)
+    if not asyncio.run(_verify(int(sys.argv[1]))):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
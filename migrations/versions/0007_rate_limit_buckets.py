@@ -0,0 +1,30 @@
+"""shared rate limit buckets
+
+Revision ID: 0007_rate_limit_buckets
+Revises: 0006_bigint_broadcast_resume_ids
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0007_rate_limit_buckets"
+down_revision: Union[str, None] = "0006_bigint_broadcast_resume_ids"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "rate_limit_buckets",
+        sa.Column("name", sa.String(length=64), primary_key=True),
+        sa.Column("tat", sa.Float(), nullable=False, server_default="0"),
+    )
+    op.execute("INSERT INTO rate_limit_buckets (name, tat) VALUES ('telegram_global', 0)")
+
+
+def downgrade() -> None:
+    op.drop_table("rate_limit_buckets")
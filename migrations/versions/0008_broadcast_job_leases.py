@@ -0,0 +1,27 @@
+"""broadcast job leases
+
+Revision ID: 0008_broadcast_job_leases
+Revises: 0007_rate_limit_buckets
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0008_broadcast_job_leases"
+down_revision: Union[str, None] = "0007_rate_limit_buckets"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("broadcast_jobs", sa.Column("lease_owner", sa.String(length=128)))
+    op.add_column("broadcast_jobs", sa.Column("lease_expires_at", sa.DateTime(timezone=True)))
+
+
+def downgrade() -> None:
+    op.drop_column("broadcast_jobs", "lease_expires_at")
+    op.drop_column("broadcast_jobs", "lease_owner")
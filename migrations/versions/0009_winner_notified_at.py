@@ -0,0 +1,27 @@
+"""winner notification progress
+
+Revision ID: 0009_winner_notified_at
+Revises: 0008_broadcast_job_leases
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0009_winner_notified_at"
+down_revision: Union[str, None] = "0008_broadcast_job_leases"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("winners", sa.Column("notified_at", sa.DateTime(timezone=True)))
+    # Winners picked before this migration were already notified inline.
+    op.execute("UPDATE winners SET notified_at = picked_at")
+
+
+def downgrade() -> None:
+    op.drop_column("winners", "notified_at")
@@ -0,0 +1,31 @@
+"""seeded, verifiable winner draws
+
+Revision ID: 0010_seeded_draws
+Revises: 0009_winner_notified_at
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0010_seeded_draws"
+down_revision: Union[str, None] = "0009_winner_notified_at"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("giveaways", sa.Column("draw_commitment", sa.String(length=64)))
+    op.add_column("giveaways", sa.Column("draw_secret", sa.String(length=64)))
+    op.add_column("giveaways", sa.Column("draw_seed", sa.String(length=64)))
+    op.add_column("giveaways", sa.Column("draw_algorithm", sa.String(length=32)))
+
+
+def downgrade() -> None:
+    op.drop_column("giveaways", "draw_algorithm")
+    op.drop_column("giveaways", "draw_seed")
+    op.drop_column("giveaways", "draw_secret")
+    op.drop_column("giveaways", "draw_commitment")
@@ -0,0 +1,79 @@
+"""collision-free participant ticket numbers
+
+Revision ID: 0011_participant_tickets
+Revises: 0010_seeded_draws
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0011_participant_tickets"
+down_revision: Union[str, None] = "0010_seeded_draws"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Three-round Feistel network over the 30 low bits of participants.id: a bijection, so
+    # distinct ids always give distinct tickets, but consecutive joins get unrelated numbers.
+    # The +10000 offset keeps new tickets clear of the legacy random 1000-9999 range.
+    op.execute(
+        """
+        CREATE FUNCTION participant_ticket(value integer) RETURNS integer AS $$
+        DECLARE
+            l1 integer := (value >> 15) & 32767;
+            r1 integer := value & 32767;
+            l2 integer;
+            r2 integer;
+        BEGIN
+            FOR i IN 1..3 LOOP
+                l2 := r1;
+                r2 := l1 # ((((1366 * r1 + 150889) % 714025) / 714025.0) * 32767)::integer;
+                l1 := l2;
+                r1 := r2;
+            END LOOP;
+            RETURN 10000 + ((l1 << 15) | r1);
+        END;
+        $$ LANGUAGE plpgsql IMMUTABLE STRICT
+        """
+    )
+    op.execute(
+        """
+        CREATE FUNCTION participants_set_ticket() RETURNS trigger AS $$
+        BEGIN
+            NEW.ticket_number := participant_ticket(NEW.id);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER participants_set_ticket BEFORE INSERT ON participants
+        FOR EACH ROW EXECUTE FUNCTION participants_set_ticket()
+        """
+    )
+    # Existing duplicates keep the ticket of the earliest joiner; the rest are renumbered.
+    op.execute(
+        """
+        UPDATE participants p SET ticket_number = participant_ticket(p.id)
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY giveaway_id, ticket_number ORDER BY id) AS n
+            FROM participants
+        ) d
+        WHERE d.id = p.id AND d.n > 1
+        """
+    )
+    op.create_unique_constraint(
+        "uq_participants_giveaway_ticket", "participants", ["giveaway_id", "ticket_number"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_participants_giveaway_ticket", "participants", type_="unique")
+    op.execute("DROP TRIGGER participants_set_ticket ON participants")
+    op.execute("DROP FUNCTION participants_set_ticket()")
+    op.execute("DROP FUNCTION participant_ticket(integer)")
@@ -0,0 +1,98 @@
+"""trigger-maintained per-giveaway counters
+
+Revision ID: 0012_giveaway_counters
+Revises: 0011_participant_tickets
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0012_giveaway_counters"
+down_revision: Union[str, None] = "0011_participant_tickets"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_COUNTED = (("participants", "participants"), ("winners", "winners"), ("broadcasts", "broadcasts"))
+
+
+def upgrade() -> None:
+    op.create_table(
+        "giveaway_counters",
+        sa.Column("giveaway_id", sa.Integer(), nullable=False),
+        sa.Column("slot", sa.SmallInteger(), nullable=False),
+        sa.Column("participants", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("winners", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("broadcasts", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.ForeignKeyConstraint(["giveaway_id"], ["giveaways.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("giveaway_id", "slot"),
+    )
+    # One statement-level trigger per table and operation: the delta is aggregated from the
+    # transition table, so a multi-row INSERT ... SELECT (the winner draw) costs one upsert
+    # per giveaway. TG_ARGV[0] names the counter column, the slot is picked at random
+    # (16 slots, matching COUNTER_SLOTS). Rows removed by a giveaway's cascading delete are
+    # skipped, as its counters are deleted with it.
+    op.execute(
+        """
+        CREATE FUNCTION giveaway_counters_apply() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                EXECUTE format(
+                    'INSERT INTO giveaway_counters AS c (giveaway_id, slot, %1$I)
+                     SELECT t.giveaway_id, floor(random() * 16)::smallint, count(*)
+                     FROM new_rows t JOIN giveaways g ON g.id = t.giveaway_id
+                     GROUP BY t.giveaway_id
+                     ON CONFLICT (giveaway_id, slot) DO UPDATE SET %1$I = c.%1$I + EXCLUDED.%1$I',
+                    TG_ARGV[0]
+                );
+            ELSE
+                EXECUTE format(
+                    'INSERT INTO giveaway_counters AS c (giveaway_id, slot, %1$I)
+                     SELECT t.giveaway_id, floor(random() * 16)::smallint, -count(*)
+                     FROM old_rows t JOIN giveaways g ON g.id = t.giveaway_id
+                     GROUP BY t.giveaway_id
+                     ON CONFLICT (giveaway_id, slot) DO UPDATE SET %1$I = c.%1$I + EXCLUDED.%1$I',
+                    TG_ARGV[0]
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for table, column in _COUNTED:
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_count_insert AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION giveaway_counters_apply('{column}')
+            """
+        )
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_count_delete AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION giveaway_counters_apply('{column}')
+            """
+        )
+    op.execute(
+        """
+        INSERT INTO giveaway_counters (giveaway_id, slot, participants, winners, broadcasts)
+        SELECT g.id, 0,
+            (SELECT count(*) FROM participants p WHERE p.giveaway_id = g.id),
+            (SELECT count(*) FROM winners w WHERE w.giveaway_id = g.id),
+            (SELECT count(*) FROM broadcasts b WHERE b.giveaway_id = g.id)
+        FROM giveaways g
+        """
+    )
+
+
+def downgrade() -> None:
+    for table, _ in _COUNTED:
+        op.execute(f"DROP TRIGGER {table}_count_delete ON {table}")
+        op.execute(f"DROP TRIGGER {table}_count_insert ON {table}")
+    op.execute("DROP FUNCTION giveaway_counters_apply()")
+    op.drop_table("giveaway_counters")
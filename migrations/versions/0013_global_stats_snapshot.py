@@ -0,0 +1,59 @@
+"""materialized global stats snapshot
+
+Revision ID: 0013_global_stats_snapshot
+Revises: 0012_giveaway_counters
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0013_global_stats_snapshot"
+down_revision: Union[str, None] = "0012_giveaway_counters"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Single-row view; the constant id carries the unique index REFRESH ... CONCURRENTLY needs.
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW global_stats_snapshot AS
+        SELECT
+            1 AS id,
+            g.giveaways_total,
+            g.giveaways_active,
+            g.giveaways_finished,
+            p.participants_total,
+            p.participants_can_dm,
+            c.winners_total,
+            c.broadcasts_total,
+            now() AS refreshed_at
+        FROM (
+            SELECT
+                count(*) AS giveaways_total,
+                count(*) FILTER (WHERE status = 'ACTIVE') AS giveaways_active,
+                count(*) FILTER (WHERE status = 'FINISHED') AS giveaways_finished
+            FROM giveaways
+        ) g,
+        (
+            SELECT
+                count(DISTINCT user_id) AS participants_total,
+                count(DISTINCT user_id) FILTER (WHERE can_dm) AS participants_can_dm
+            FROM participants
+        ) p,
+        (
+            SELECT
+                coalesce(sum(winners), 0)::bigint AS winners_total,
+                coalesce(sum(broadcasts), 0)::bigint AS broadcasts_total
+            FROM giveaway_counters
+        ) c
+        """
+    )
+    op.execute("CREATE UNIQUE INDEX ix_global_stats_snapshot_id ON global_stats_snapshot (id)")
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW global_stats_snapshot")
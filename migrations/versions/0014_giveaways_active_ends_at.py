@@ -0,0 +1,31 @@
+"""partial index on ends_at of active giveaways
+
+Revision ID: 0014_giveaways_active_ends_at
+Revises: 0013_global_stats_snapshot
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0014_giveaways_active_ends_at"
+down_revision: Union[str, None] = "0013_global_stats_snapshot"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_giveaways_active_ends_at",
+        "giveaways",
+        ["ends_at"],
+        unique=False,
+        postgresql_where=sa.text("status = 'ACTIVE' AND ends_at IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_giveaways_active_ends_at", table_name="giveaways")
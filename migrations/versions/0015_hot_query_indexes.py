@@ -0,0 +1,51 @@
+"""partial and composite indexes for the hot query shapes
+
+Revision ID: 0015_hot_query_indexes
+Revises: 0014_giveaways_active_ends_at
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0015_hot_query_indexes"
+down_revision: Union[str, None] = "0014_giveaways_active_ends_at"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_INDEXES = (
+    # per-giveaway broadcast pages: giveaway_id = ? AND can_dm AND id > ? ORDER BY id; the page
+    # only reads user_id, so carrying it makes the page an index-only scan
+    ("ix_participants_giveaway_can_dm_id", "participants", ["giveaway_id", "id"], ["user_id"], "can_dm"),
+    # global broadcast pages: can_dm AND user_id > ? ORDER BY user_id
+    ("ix_users_can_dm_user_id", "users", ["user_id"], [], "can_dm"),
+    # worker claim: status IN ('PENDING', 'RUNNING') ORDER BY id
+    ("ix_broadcast_jobs_open_id", "broadcast_jobs", ["id"], [], "status IN ('PENDING', 'RUNNING')"),
+    # winner notification claim: giveaway_id = ? AND notified_at IS NULL ORDER BY id
+    ("ix_winners_giveaway_unnotified_id", "winners", ["giveaway_id", "id"], [], "notified_at IS NULL"),
+)
+
+
+def upgrade() -> None:
+    # Built CONCURRENTLY so joins and sends keep writing to these tables during the deploy.
+    with op.get_context().autocommit_block():
+        for name, table, columns, include, where in _INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_include=include,
+                postgresql_where=sa.text(where),
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _, _ in reversed(_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,27 @@
+"""record when a giveaway was drawn
+
+Revision ID: 0017_giveaway_drawn_at
+Revises: 0015_hot_query_indexes
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0017_giveaway_drawn_at"
+down_revision: Union[str, None] = "0015_hot_query_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Left NULL for giveaways drawn before this column existed; their draws are verified
+    # against all participants, as before.
+    op.add_column("giveaways", sa.Column("drawn_at", sa.DateTime(timezone=True)))
+
+
+def downgrade() -> None:
+    op.drop_column("giveaways", "drawn_at")